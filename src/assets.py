@@ -0,0 +1,414 @@
+"""画像アセットの共有キャッシュ"""
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+from collections import OrderedDict
+from multiprocessing import resource_tracker, shared_memory
+import pygame
+from constants import *
+
+# ディスクキャッシュのファイル: ヘッダー（識別子, バージョン, 元画像の更新時刻, 幅, 高さ, 形式）+ ピクセル
+DISK_CACHE_MAGIC = b"RPGA"
+DISK_CACHE_VERSION = 1
+DISK_CACHE_HEADER = struct.Struct("<4sHqII4s")
+
+def decode_image(path, size=None, region=None):
+    """画像ファイルを読み込む
+    
+    regionを指定すればその矩形を切り出し、sizeを指定すればその大きさに拡大縮小する
+    """
+    surface = pygame.image.load(path)
+    if region:
+        surface = surface.subsurface(region)
+    if size:
+        surface = pygame.transform.scale(surface, size)
+    return surface
+
+def get_pixel_bytes(key):
+    """デコードした画像の画素が収まるバイト数（RGBAとして数える）。読み込む前にわからなければNone"""
+    path, size, region = key
+    if size:
+        return size[0] * size[1] * 4
+    if region:
+        return region[2] * region[3] * 4
+    return None
+
+def decode_to_shared_memory(task):
+    """画像をデコードして、preload()が用意した共有メモリに画素を書き込む（ワーカープロセスで実行する）
+    
+    taskは (キー, 共有メモリの名前)。(キー, (バイト数, 大きさ, 形式)) を返す。読み込めなければ
+    (キー, None)
+    """
+    key, name = task
+    try:
+        surface = decode_image(*key)
+    except Exception:
+        return key, None
+    format = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+    pixels = pygame.image.tobytes(surface, format)
+    shm = shared_memory.SharedMemory(name)
+    try:
+        shm.buf[:len(pixels)] = pixels
+    finally:
+        shm.close()
+    return key, (len(pixels), surface.get_size(), format)
+
+class DiskCache:
+    """拡大縮小した画像をピクセルのままファイルに保存し、次の起動からはデコードせずに読み込む
+    
+    ファイルは (元画像のパス, サイズ, 切り出す矩形) ごとに1つで、元画像の更新時刻が
+    変わっていたら作り直す
+    """
+    def __init__(self, directory=ASSET_DISK_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+    
+    def path_for(self, key):
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".raw")
+    
+    def load(self, key):
+        """保存してあるサーフェスを返す（ないか古ければNone）
+        
+        途中で切れたり壊れたりしているファイルは消して、次に保存するときに作り直す
+        """
+        path = self.path_for(key)
+        try:
+            mtime = os.stat(key[0]).st_mtime_ns
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            magic, version, source_mtime, width, height, format = DISK_CACHE_HEADER.unpack_from(data, 0)
+            if magic != DISK_CACHE_MAGIC or version != DISK_CACHE_VERSION or source_mtime != mtime:
+                return None
+            format = format.decode("ascii").strip()
+            surface = pygame.image.frombuffer(memoryview(data)[DISK_CACHE_HEADER.size:], (width, height), format)
+        except (OSError, struct.error, ValueError) as e:
+            print(f"壊れた画像キャッシュを削除します: {path}")
+            print(f"エラー: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        self.hits += 1
+        return surface
+    
+    def save(self, key, surface):
+        """サーフェスのピクセルを保存する（失敗してもゲームは続ける）"""
+        try:
+            format = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+            header = DISK_CACHE_HEADER.pack(DISK_CACHE_MAGIC, DISK_CACHE_VERSION,
+                                            os.stat(key[0]).st_mtime_ns, *surface.get_size(),
+                                            format.ljust(4).encode("ascii"))
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path_for(key)
+            with open(path + ".tmp", "wb") as f:
+                f.write(header)
+                f.write(pygame.image.tobytes(surface, format))
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            print(f"画像のキャッシュを保存できませんでした: {key[0]}")
+            print(f"エラー: {e}")
+
+class AssetManager:
+    """画像を(パス, サイズ)ごとに1回だけ読み込み、画面のピクセル形式にして共有する（LRU・メモリ上限付き）
+    
+    アトラス（atlas_builder.pyで作る）に入っている画像は、アトラス画像の一部を
+    subsurfaceで切り出して返す（アトラス画像は最初に使うときに1枚ずつ読み込む）
+    """
+    def __init__(self, max_bytes=ASSET_CACHE_BYTES, atlas_index_path=ATLAS_INDEX_PATH,
+                 disk_cache_dir=ASSET_DISK_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()  # (パス, サイズ) -> サーフェス（末尾ほど最近使った）
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()  # キャッシュと読み込み中の表を先読みのスレッドと共有する
+        self.loading = {}  # 読み込み中のキー -> デコードが終わるとセットされるEvent
+        self.decoded = queue.Queue()  # 先読みのスレッドがデコードした (キー, サーフェス, ディスクキャッシュから読んだか)
+        self.atlas = {}  # (パス, サイズ, 切り出す矩形) -> (ページ番号, 矩形)
+        self.atlas_pages = []  # ページ番号 -> アトラス画像のパス
+        self.atlas_surfaces = {}  # ページ番号 -> 読み込んだアトラス画像
+        self.atlas_bytes = 0
+        # 拡大縮小した画像のディスクキャッシュ
+        self.disk_cache = DiskCache(disk_cache_dir) if disk_cache_dir else None
+        self.load_atlas_index(atlas_index_path)
+    
+    def load_atlas_index(self, path):
+        """アトラスの索引を読み込む（なければ何もしない）
+        
+        アトラスを作った後に更新された元画像は、アトラスを使わずにファイルから読み込む
+        """
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+        except Exception as e:
+            print(f"アトラスの索引を読み込めませんでした: {path}")
+            print(f"エラー: {e}")
+            return
+        
+        directory = os.path.dirname(path)
+        self.atlas_pages = [os.path.join(directory, page) for page in index["pages"]]
+        for entry in index["images"]:
+            image_path = entry["path"]
+            if os.path.exists(image_path) and os.path.getmtime(image_path) > entry["mtime"]:
+                continue
+            key = self.make_key(image_path, entry["size"], entry.get("region"))
+            self.atlas[key] = (entry["page"], pygame.Rect(entry["rect"]))
+    
+    def make_key(self, path, size=None, region=None):
+        """キャッシュのキー (パス, サイズ, 切り出す矩形)"""
+        return (path, tuple(size) if size else None, tuple(region) if region else None)
+    
+    def load(self, path, size=None, region=None):
+        """画像を読み込んで返す
+        
+        regionを指定すればその矩形を切り出し、sizeを指定すればその大きさに拡大縮小する。
+        返したサーフェスは共有なので書き換えないこと。読み込めなければ例外を送出する。
+        メインスレッドから呼ぶ（先読みのスレッドはprefetch()を使う）。先読みのスレッドが
+        デコード中の画像は、二重にデコードせずにその完了を待って受け取る
+        """
+        key = self.make_key(path, size, region)
+        # ロックするのは表を引くときだけにして、デコードの間は先読みのスレッドを止めない
+        with self.lock:
+            surface = self.surfaces.get(key)
+            if surface is not None:
+                self.surfaces.move_to_end(key)
+                self.hits += 1
+                return surface
+            decoding = self.loading.get(key)
+            if decoding is None:
+                self.loading[key] = threading.Event()
+        
+        if decoding is not None:
+            decoding.wait()
+            self.update()
+            return self.load(path, size, region)
+        
+        try:
+            self.misses += 1
+            surface = self.load_from_atlas(key)
+            if surface is None:
+                surface = self.load_from_disk(key)
+            if surface is None:
+                surface = self.convert(decode_image(path, size, region))
+                self.save_to_disk(key, surface)
+            return self.store(key, surface)
+        finally:
+            with self.lock:
+                self.loading.pop(key).set()
+    
+    def prefetch(self, path, size=None, region=None):
+        """先読みのスレッドで画像をデコードしておく（変換とキャッシュへの登録はupdate()で行う）
+        
+        キャッシュにある画像と読み込み中の画像は何もしない。アトラスに入っている画像は
+        切り出すだけなので先読みしない
+        """
+        key = self.make_key(path, size, region)
+        with self.lock:
+            if key in self.surfaces or key in self.loading or key in self.atlas:
+                return
+            decoding = self.loading[key] = threading.Event()
+        
+        surface = None
+        from_disk = False
+        try:
+            if key[1] and self.disk_cache:
+                surface = self.disk_cache.load(key)
+                from_disk = surface is not None
+            if surface is None:
+                surface = decode_image(path, size, region)
+        except Exception:
+            pass  # 読み込めない画像はマップを作るときにエラーを表示する
+        self.decoded.put((key, surface, from_disk))
+        decoding.set()
+    
+    def update(self):
+        """先読みのスレッドがデコードした画像を画面の形式にしてキャッシュに入れる（メインスレッドで毎フレーム呼ぶ）"""
+        while True:
+            try:
+                key, surface, from_disk = self.decoded.get_nowait()
+            except queue.Empty:
+                return
+            if surface is not None:
+                surface = self.convert(surface)
+                if not from_disk:
+                    self.save_to_disk(key, surface)
+                self.misses += 1
+                self.store(key, surface)
+            with self.lock:
+                self.loading.pop(key, None)
+    
+    def store(self, key, surface):
+        """サーフェスをキャッシュに入れて返す"""
+        with self.lock:
+            self.surfaces[key] = surface
+            self.bytes_used += self.get_surface_bytes(surface)
+            
+            # 上限を超えたら古いものから捨てる（使用中のサーフェスは持ち主が参照し続ける）
+            while self.bytes_used > self.max_bytes and len(self.surfaces) > 1:
+                _, old_surface = self.surfaces.popitem(last=False)
+                self.bytes_used -= self.get_surface_bytes(old_surface)
+        return surface
+    
+    def preload(self, keys, workers=ASSET_PRELOAD_WORKERS):
+        """画像をまとめて読み込んでおく（後のload()はキャッシュから返る）
+        
+        keysは load() の引数と同じ (パス, サイズ, 切り出す矩形) のリスト。アトラスにも
+        ディスクキャッシュにもない画像は複数のプロセスで並列にデコードし、画素はこのプロセスで
+        用意した共有メモリで受け取ってそのままサーフェスにし、画面の形式に変換する。並列に
+        読み込めなかった画像は1枚ずつ読み込む。読み込めない画像は飛ばす（load()でエラーになる）
+        """
+        pending = []
+        for key in keys:
+            key = self.make_key(*key)
+            if key in self.surfaces or key in pending:
+                continue
+            surface = self.load_from_atlas(key)
+            if surface is None:
+                surface = self.load_from_disk(key)
+            if surface is None:
+                pending.append(key)
+                continue
+            self.misses += 1
+            self.store(key, surface)
+        
+        # 大きさが読み込む前にわからない画像は、このプロセスで1枚ずつ読み込む
+        serial = [key for key in pending if get_pixel_bytes(key) is None]
+        parallel = [key for key in pending if get_pixel_bytes(key) is not None]
+        workers = min(workers or os.cpu_count() or 1, len(parallel))
+        if workers < 2:
+            # 1枚だけならプロセスを起動するほうが遅い
+            serial, parallel = pending, []
+        
+        blocks = {}  # キー -> このプロセスで作った共有メモリ（ワーカーから受け取るまで開いておく）
+        try:
+            if parallel:
+                if os.name == "posix":
+                    # ワーカーが開いた共有メモリも同じ監視プロセスに登録させるため、先に起動しておく
+                    resource_tracker.ensure_running()
+                for key in parallel:
+                    blocks[key] = shared_memory.SharedMemory(create=True, size=get_pixel_bytes(key))
+                self.decode_in_pool(blocks, workers)
+        except Exception as e:
+            print("画像を並列に読み込めませんでした（1枚ずつ読み込みます）")
+            print(f"エラー: {e}")
+        finally:
+            # 受け取れなかった画像は1枚ずつ読み込み直す
+            for key, shm in blocks.items():
+                serial.append(key)
+                shm.close()
+                shm.unlink()
+        
+        for key in serial:
+            try:
+                self.load(*key)
+            except Exception:
+                pass
+    
+    def decode_in_pool(self, blocks, workers):
+        """blocksの画像をワーカープロセスでデコードし、共有メモリから受け取ってキャッシュに入れる
+        
+        受け取った画像の共有メモリはblocksから取り除いて片付ける
+        """
+        # pygameはSIGTERMを横取りするので、terminate()ではなくclose()してワーカーの終了を待つ
+        pool = multiprocessing.Pool(workers)
+        try:
+            tasks = [(key, shm.name) for key, shm in blocks.items()]
+            # デコードの終わったものから順に受け取る
+            for key, result in pool.imap_unordered(decode_to_shared_memory, tasks):
+                if result is None:
+                    continue
+                length, size, format = result
+                shm = blocks.pop(key)
+                surface = pygame.image.frombuffer(shm.buf[:length], size, format)
+                converted = self.convert(surface)
+                if converted is surface:
+                    # 画面がなく変換しなかったときは、共有メモリを閉じる前にコピーする
+                    converted = surface.copy()
+                del surface
+                shm.close()
+                shm.unlink()
+                self.misses += 1
+                self.save_to_disk(key, converted)
+                self.store(key, converted)
+        finally:
+            pool.close()
+            pool.join()
+    
+    def load_from_disk(self, key):
+        """ディスクキャッシュにあれば読み込む（拡大縮小した画像だけ保存している）"""
+        if not key[1] or not self.disk_cache:
+            return None
+        surface = self.disk_cache.load(key)
+        if surface is None:
+            return None
+        return self.convert(surface)
+    
+    def save_to_disk(self, key, surface):
+        if key[1] and self.disk_cache:
+            self.disk_cache.save(key, surface)
+    
+    def load_from_atlas(self, key):
+        """アトラスに入っていれば、その部分を切り出したサーフェスを返す（なければNone）"""
+        location = self.atlas.get(key)
+        if location is None:
+            return None
+        page_number, rect = location
+        page = self.atlas_surfaces.get(page_number)
+        if page is None:
+            page = self.convert(pygame.image.load(self.atlas_pages[page_number]))
+            self.atlas_surfaces[page_number] = page
+            self.atlas_bytes += self.get_surface_bytes(page)
+        return page.subsurface(rect)
+    
+    def convert(self, surface):
+        """画面と同じピクセル形式にする（blitのたびに変換しなくて済む）
+        
+        画面がまだない（ヘッドレスなど）ときはそのまま返す
+        """
+        if pygame.display.get_surface() is None:
+            return surface
+        if surface.get_flags() & pygame.SRCALPHA or surface.get_colorkey() is not None:
+            return surface.convert_alpha()
+        return surface.convert()
+    
+    def get_surface_bytes(self, surface):
+        # アトラスから切り出したサーフェスはアトラス画像のピクセルを共有している
+        if surface.get_parent() is not None:
+            return 0
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+    
+    def get_stats(self):
+        """ヒット数、ミス数、保持しているサーフェスの数とバイト数"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "count": len(self.surfaces),
+            "bytes": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "atlas_pages": len(self.atlas_surfaces),
+            "atlas_bytes": self.atlas_bytes,
+            "disk_hits": self.disk_cache.hits if self.disk_cache else 0,
+        }
+    
+    def clear(self):
+        with self.lock:
+            self.surfaces.clear()
+            self.bytes_used = 0
+
+# ゲーム全体で共有するキャッシュ
+asset_manager = AssetManager()
+
+def load_image(path, size=None, region=None):
+    """共有キャッシュを使って画像を読み込む"""
+    return asset_manager.load(path, size, region)
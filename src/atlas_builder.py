@@ -0,0 +1,99 @@
+"""アトラスビルダー（NPCのスプライトとポートレートを数枚のアトラス画像にまとめる）
+
+使い方:
+    python src/atlas_builder.py
+
+すべてのマップのNPCが使う画像を、ゲームで使う大きさにしてから
+assets/atlas/atlas_0.png, atlas_1.png ... に詰め込み、どの画像がどこにあるかを
+assets/atlas/atlas.json に書き出す。ゲームはアトラス画像だけを読み込み、
+各画像はその一部をsubsurfaceで切り出して使う（元画像を更新したら作り直すこと）。
+"""
+import json
+import os
+import sys
+import pygame
+from constants import *
+from assets import decode_image
+from headless import init_headless
+from map import get_asset_keys
+
+
+def pack_shelves(sizes, page_size=ATLAS_PAGE_SIZE, padding=ATLAS_PADDING):
+    """大きさのリストを棚詰めで配置し、それぞれの (ページ番号, x, y) を返す
+    
+    背の高い順に左から並べ、幅が足りなくなったら次の棚、高さが足りなくなったら次のページにする
+    """
+    placements = [None] * len(sizes)
+    page = x = y = shelf_height = 0
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0])):
+        width, height = sizes[i]
+        if width > page_size or height > page_size:
+            raise ValueError(f"{width}x{height} の画像はアトラス（{page_size}x{page_size}）に入りません")
+        if x + width > page_size:
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        if y + height > page_size:
+            page += 1
+            x = y = shelf_height = 0
+        placements[i] = (page, x, y)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+    return placements
+
+
+def build_atlas(keys, directory=ATLAS_DIR):
+    """(パス, サイズ, 切り出す矩形) の画像をアトラスにまとめて書き出し、索引のパスを返す"""
+    images = []
+    for path, size, region in keys:
+        try:
+            images.append((path, size, region, decode_image(path, size, region)))
+        except Exception as e:
+            print(f"画像を読み込めませんでした: {path}")
+            print(f"エラー: {e}")
+    placements = pack_shelves([image.get_size() for _, _, _, image in images])
+    
+    # ページごとに使っている範囲だけの大きさにする
+    page_count = max((page for page, _, _ in placements), default=-1) + 1
+    extents = [[0, 0] for _ in range(page_count)]
+    for (page, x, y), (_, _, _, image) in zip(placements, images):
+        extents[page][0] = max(extents[page][0], x + image.get_width())
+        extents[page][1] = max(extents[page][1], y + image.get_height())
+    pages = [pygame.Surface(extent, pygame.SRCALPHA) for extent in extents]
+    
+    entries = []
+    for (page, x, y), (path, size, region, image) in zip(placements, images):
+        pages[page].blit(image, (x, y))
+        entries.append({
+            "path": path,
+            "size": list(size) if size else None,
+            "region": list(region) if region else None,
+            "mtime": os.path.getmtime(path),
+            "page": page,
+            "rect": [x, y, image.get_width(), image.get_height()],
+        })
+    
+    os.makedirs(directory, exist_ok=True)
+    page_names = []
+    for page, surface in enumerate(pages):
+        name = f"atlas_{page}.png"
+        pygame.image.save(surface, os.path.join(directory, name))
+        page_names.append(name)
+    index_path = os.path.join(directory, "atlas.json")
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"pages": page_names, "images": entries}, f, ensure_ascii=False)
+    return index_path
+
+
+def main():
+    init_headless()
+    pygame.init()
+    index_path = build_atlas(get_asset_keys())
+    with open(index_path, encoding="utf-8") as f:
+        index = json.load(f)
+    print(f"画像{len(index['images'])}枚をアトラス{len(index['pages'])}枚にまとめました: {index_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
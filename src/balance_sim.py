@@ -0,0 +1,248 @@
+"""戦闘バランスのモンテカルロシミュレーター（NumPyの配列で大量の戦闘をまとめて進める）
+
+使い方:
+    python src/balance_sim.py                   # 組み合わせごとに20000回の連戦
+    python src/balance_sim.py 100000 --seed 1  # 回数と乱数の種を指定
+
+Battleと同じルールで1ターンずつ進める:
+    ダメージ = max(1, 攻撃力 - 防御力)
+    ボスはHPが30%未満になると攻撃力1.3倍（Boss.get_attack_damage、値はdata/enemies.json）
+    攻撃UP(+15)・防御UP(+10)はプレイヤーの行動5回分続く
+    通常の敵に勝つと30%の確率でポーションを落とす
+
+ダメージに乱数はないので1戦の結果は組み合わせごとに決まる。
+HPとポーションを持ち越す連戦はドロップ次第で結果が分かれるため、
+組み合わせごとに指定した回数ずつまとめてシミュレーションする。
+
+プレイヤーの行動はHPが30%未満ならポーション（なければスーパーポーション）、
+持っていれば攻撃UP・防御UPを使い、それ以外は攻撃する。
+"""
+import sys
+import time
+import numpy as np
+from enemy_types import ENEMY_TYPES
+
+# アイテムの効果（Inventory.apply_itemと同じ値）
+POTION_HEAL = 50
+ATTACK_BUFF = 15
+DEFENSE_BUFF = 10
+BUFF_TURNS = 5
+POTION_DROP_RATE = 0.3  # Battle.victory
+
+HEAL_THRESHOLD = 0.3  # HPがこの割合を下回ったら回復する
+MAX_TURNS = 1000  # 決着がつかない場合の打ち切り（ダメージは最低1なので通常は届かない）
+
+# スキルの振り方（レベルアップで得たポイントの配分。各スキルの最大レベルで頭打ち）
+SKILL_ALLOCATIONS = {
+    "なし": {},
+    "攻撃": {"attack_boost": 1.0},
+    "防御": {"defense_boost": 1.0},
+    "HP": {"hp_boost": 1.0},
+    "均等": {"attack_boost": 1 / 3, "defense_boost": 1 / 3, "hp_boost": 1 / 3},
+}
+SKILL_MAX_LEVEL = 10  # 攻撃力・防御力・HP強化の最大レベル（SkillSystem）
+
+LEVELS = (1, 3, 5, 10)
+GAUNTLET_FIGHTS = 10  # 連戦の戦闘数
+
+
+def enemy_table():
+    """敵の種類ごとのステータス（data/enemies.jsonの定義から）"""
+    return [{"name": enemy_type.name, "hp": enemy_type.hp, "attack": enemy_type.attack,
+             "defense": enemy_type.defense, "boss": enemy_type.is_boss,
+             "rage_threshold": enemy_type.rage_threshold, "rage_multiplier": enemy_type.rage_multiplier}
+            for enemy_type in ENEMY_TYPES]
+
+
+def player_stats(level, allocation):
+    """レベルとスキルの振り方から (攻撃力, 防御力, 最大HP) を計算（Player.level_upと同じ成長）"""
+    points = level - 1  # レベルアップごとに1ポイント
+    skills = {name: min(SKILL_MAX_LEVEL, int(points * share)) for name, share in allocation.items()}
+    attack = 20 + 5 * (level - 1) + 3 * skills.get("attack_boost", 0)
+    defense = 5 + 2 * (level - 1) + 2 * skills.get("defense_boost", 0)
+    # HP強化は振ったあとのレベルアップから効く（最初から振ってあるものとして計算）
+    max_hp = 100 + (level - 1) * (20 + 10 * skills.get("hp_boost", 0))
+    return attack, defense, max_hp
+
+
+def simulate_fights(attack, defense, max_hp, enemy_hp, enemy_attack, enemy_defense,
+                    hp=None, potions=3, super_potions=0, power_ups=0, defense_ups=0,
+                    rage_threshold=0.0, rage_multiplier=1.0):
+    """戦闘をまとめて最後まで進める（引数は戦闘ごとの配列か、全戦闘共通の値）
+    
+    rage_threshold・rage_multiplierはボスの怒り（HPがその割合未満で攻撃力が倍率倍）
+    
+    Returns:
+        {"won", "turns", "hp", "potions", "super_potions", "power_ups", "defense_ups"} の配列
+    """
+    n = max(np.size(a) for a in (attack, defense, max_hp, enemy_hp, enemy_attack, enemy_defense))
+    
+    def column(value, dtype=np.int32):
+        return np.broadcast_to(np.asarray(value, dtype=dtype), (n,)).copy()
+    
+    # 決着がついていない戦闘だけを詰めて持つ（indexは元の位置）
+    index = np.arange(n)
+    live = {
+        "attack": column(attack), "defense": column(defense), "max_hp": column(max_hp),
+        "hp": column(max_hp if hp is None else hp),
+        "enemy_hp": column(enemy_hp), "enemy_max_hp": column(enemy_hp),
+        "enemy_attack": column(enemy_attack), "enemy_defense": column(enemy_defense),
+        "rage_threshold": column(rage_threshold, np.float64),
+        "rage_multiplier": column(rage_multiplier, np.float64),
+        "potions": column(potions), "super_potions": column(super_potions),
+        "power_ups": column(power_ups), "defense_ups": column(defense_ups),
+        "attack_boost": column(0), "defense_boost": column(0), "buff_turns": column(0),
+    }
+    result = {"won": np.zeros(n, dtype=bool), "turns": np.full(n, MAX_TURNS, dtype=np.int32)}
+    for name in ("hp", "potions", "super_potions", "power_ups", "defense_ups"):
+        result[name] = live[name].copy()
+    
+    for turn in range(1, MAX_TURNS + 1):
+        if index.size == 0:
+            break
+        s = live
+        # プレイヤーの行動: 回復 > 攻撃UP > 防御UP > 攻撃
+        low = s["hp"] < s["max_hp"] * HEAL_THRESHOLD
+        potion = low & (s["potions"] > 0)
+        super_potion = low & ~potion & (s["super_potions"] > 0)
+        heal = potion | super_potion
+        power = ~heal & (s["power_ups"] > 0) & (s["attack_boost"] == 0)
+        guard = ~heal & ~power & (s["defense_ups"] > 0) & (s["defense_boost"] == 0)
+        strike = ~(heal | power | guard)
+        
+        s["hp"] = np.where(potion, np.minimum(s["hp"] + POTION_HEAL, s["max_hp"]), s["hp"])
+        s["hp"] = np.where(super_potion, s["max_hp"], s["hp"])
+        s["potions"] -= potion
+        s["super_potions"] -= super_potion
+        s["power_ups"] -= power
+        s["defense_ups"] -= guard
+        s["attack_boost"] = np.where(power, ATTACK_BUFF, s["attack_boost"])
+        s["defense_boost"] = np.where(guard, DEFENSE_BUFF, s["defense_boost"])
+        
+        damage = np.maximum(1, s["attack"] + s["attack_boost"] - s["enemy_defense"])
+        s["enemy_hp"] = np.where(strike, np.maximum(0, s["enemy_hp"] - damage), s["enemy_hp"])
+        
+        # バフはアイテムを使ったターン以外の行動ごとに1減り、0になると両方切れる
+        s["buff_turns"] = np.where(power | guard, BUFF_TURNS, np.maximum(0, s["buff_turns"] - 1))
+        expired = s["buff_turns"] == 0
+        s["attack_boost"] = np.where(expired, 0, s["attack_boost"])
+        s["defense_boost"] = np.where(expired, 0, s["defense_boost"])
+        
+        # 敵の攻撃（ボスはHPが一定の割合未満で強くなる）
+        won = s["enemy_hp"] <= 0
+        enraged = s["enemy_hp"] < s["enemy_max_hp"] * s["rage_threshold"]
+        enemy_damage = np.where(enraged, (s["enemy_attack"] * s["rage_multiplier"]).astype(np.int32),
+                                s["enemy_attack"])
+        enemy_damage = np.maximum(1, enemy_damage - (s["defense"] + s["defense_boost"]))
+        s["hp"] = np.where(won, s["hp"], np.maximum(0, s["hp"] - enemy_damage))
+        lost = s["hp"] <= 0
+        
+        done = won | lost
+        if done.any():
+            finished = index[done]
+            result["won"][finished] = won[done]
+            result["turns"][finished] = turn
+            for name in ("hp", "potions", "super_potions", "power_ups", "defense_ups"):
+                result[name][finished] = s[name][done]
+            keep = ~done
+            index = index[keep]
+            live = {name: values[keep] for name, values in s.items()}
+    return result
+
+
+def simulate_gauntlet(attack, defense, max_hp, enemy_hp, enemy_attack, enemy_defense,
+                      fights, rng, potions=3):
+    """HPとポーションを持ち越して同じ敵と連戦する（勝つたびに30%でポーションを拾う）
+    
+    Returns:
+        (最後まで勝ち抜いたか, 合計ターン数, 残りポーション数) の配列
+    """
+    n = np.size(attack)
+    alive = np.ones(n, dtype=bool)
+    hp = np.array(max_hp, dtype=np.int32)
+    stock = np.full(n, potions, dtype=np.int32)
+    total_turns = np.zeros(n, dtype=np.int32)
+    for _ in range(fights):
+        runs = np.flatnonzero(alive)
+        if runs.size == 0:
+            break
+        result = simulate_fights(attack[runs], defense[runs], max_hp[runs], enemy_hp[runs],
+                                 enemy_attack[runs], enemy_defense[runs],
+                                 hp=hp[runs], potions=stock[runs])
+        hp[runs] = result["hp"]
+        total_turns[runs] += result["turns"]
+        stock[runs] = result["potions"] + (result["won"] & (rng.random(runs.size) < POTION_DROP_RATE))
+        alive[runs] = result["won"]
+    return alive, total_turns, stock
+
+
+def main():
+    args = sys.argv[1:]
+    seed = None
+    if "--seed" in args:
+        seed = int(args[args.index("--seed") + 1])
+        del args[args.index("--seed"):args.index("--seed") + 2]
+    count = int(args[0]) if args else 20000
+    rng = np.random.default_rng(seed)
+    enemies = enemy_table()
+    
+    # すべての (敵, レベル, スキル) の組み合わせを1つの配列に並べて一度に計算する
+    configs = [(enemy, level, allocation)
+               for enemy in enemies for level in LEVELS for allocation in SKILL_ALLOCATIONS]
+    stats = np.array([player_stats(level, SKILL_ALLOCATIONS[allocation]) for _, level, allocation in configs])
+    enemy_stats = np.array([(e["hp"], e["attack"], e["defense"], e["boss"]) for e, _, _ in configs])
+    boss = enemy_stats[:, 3].astype(bool)
+    rage = np.array([(e["rage_threshold"], e["rage_multiplier"]) for e, _, _ in configs])
+    
+    # 1戦ごとの結果（ダメージに乱数はないので組み合わせごとに1戦で決まる）
+    # ボス戦はストーリーモードで商人からもらう強化アイテムを持って挑む
+    single = simulate_fights(stats[:, 0], stats[:, 1], stats[:, 2],
+                             enemy_stats[:, 0], enemy_stats[:, 1], enemy_stats[:, 2],
+                             super_potions=boss * 2, power_ups=boss * 2, defense_ups=boss * 2,
+                             rage_threshold=rage[:, 0], rage_multiplier=rage[:, 1])
+    
+    # 10連戦（ポーションのドロップで結果が分かれるので組み合わせごとにcount回）
+    normal = [i for i, (enemy, _, _) in enumerate(configs) if not enemy["boss"]]
+    runs = np.repeat(np.array(normal), count)
+    start = time.perf_counter()
+    alive, total_turns, stock = simulate_gauntlet(stats[runs, 0], stats[runs, 1], stats[runs, 2],
+                                                  enemy_stats[runs, 0], enemy_stats[runs, 1],
+                                                  enemy_stats[runs, 2], GAUNTLET_FIGHTS, rng)
+    elapsed = time.perf_counter() - start
+    print(f"{runs.size}回の{GAUNTLET_FIGHTS}連戦（{runs.size * GAUNTLET_FIGHTS}戦まで）を"
+          f"{elapsed:.2f}秒で計算")
+    
+    alive = alive.reshape(len(normal), count)
+    total_turns = total_turns.reshape(len(normal), count)
+    stock = stock.reshape(len(normal), count)
+    gauntlet = {config: row for row, config in enumerate(normal)}
+    
+    current = None
+    for i, (enemy, level, allocation) in enumerate(configs):
+        if enemy["name"] != current:
+            current = enemy["name"]
+            print()
+            print(f"■ {current}（HP {enemy['hp']} 攻撃 {enemy['attack']} 防御 {enemy['defense']}）")
+            if enemy["boss"]:
+                print("  Lv スキル  1戦: 結果 ターン 残りHP  （スーパーポーション・攻撃UP・防御UP各2個）")
+            else:
+                print(f"  Lv スキル  1戦: 結果 ターン 残りHP  {GAUNTLET_FIGHTS}連戦: 勝ち抜き率 "
+                      "合計ターン(10% 50% 90%) 残りポーション")
+        result = "勝ち" if single["won"][i] else "負け"
+        width = sum(2 if ord(c) > 0x7f else 1 for c in allocation)  # 全角は2文字分
+        line = (f"  {level:2d} {allocation}{' ' * (4 - width)}  "
+                f"{result}  {single['turns'][i]:5d}  {single['hp'][i] / stats[i, 2] * 100:5.1f}%")
+        if i in gauntlet:
+            row = gauntlet[i]
+            won = alive[row]
+            if won.any():
+                p10, p50, p90 = np.percentile(total_turns[row][won], (10, 50, 90))
+                line += (f"      {won.mean() * 100:5.1f}%     {p10:5.0f} {p50:5.0f} {p90:5.0f}"
+                         f"      {stock[row][won].mean():5.2f}")
+            else:
+                line += f"      {0:5.1f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
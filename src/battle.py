@@ -2,13 +2,21 @@
 import pygame
 import random
 from constants import *
-from enemy import Boss
+from text_cache import render_text
+from enemy_types import ENEMY_TYPE_IDS
+
+# 倒した数をクエストで数える敵
+QUEST_ENEMY_TYPE = ENEMY_TYPE_IDS["slime"]
 
 class Battle:
-    def __init__(self, player, enemy, game_state=None):
+    __slots__ = ("player", "enemy", "game_state", "rng", "active", "turn", "message",
+                 "message_timer", "victory_exp", "victory_items", "level_up_messages")
+    
+    def __init__(self, player, enemy, game_state=None, rng=None):
         self.player = player
         self.enemy = enemy
         self.game_state = game_state
+        self.rng = rng or random  # ドロップ判定の乱数（リプレイでは種を固定したものを渡す）
         self.active = False
         self.turn = "player"  # player or enemy
         self.message = ""
@@ -17,6 +25,23 @@ class Battle:
         self.victory_items = []  # ドロップアイテム
         self.level_up_messages = []  # レベルアップメッセージ
         
+    def get_state(self):
+        """戦闘の進行状態（プレイヤーと敵は含まない）"""
+        return {"active": self.active, "turn": self.turn,
+                "message": self.message, "message_timer": self.message_timer,
+                "victory_exp": self.victory_exp, "victory_items": list(self.victory_items),
+                "level_up_messages": list(self.level_up_messages)}
+    
+    def restore_state(self, state):
+        """get_state()で保存した状態に戻す"""
+        self.active = state["active"]
+        self.turn = state["turn"]
+        self.message = state["message"]
+        self.message_timer = state["message_timer"]
+        self.victory_exp = state["victory_exp"]
+        self.victory_items = list(state["victory_items"])
+        self.level_up_messages = list(state["level_up_messages"])
+        
     def start(self):
         self.active = True
         self.message = f"{self.enemy.name}が現れた！"
@@ -39,10 +64,7 @@ class Battle:
             
     def enemy_attack(self):
         # ボスの場合は特殊攻撃を考慮
-        if isinstance(self.enemy, Boss):
-            damage = int(self.enemy.get_attack_damage())
-        else:
-            damage = self.enemy.attack
+        damage = int(self.enemy.get_attack_damage())
             
         # 防御力を考慮（バフを考慮）
         actual_damage = max(1, damage - self.player.get_total_defense())
@@ -60,6 +82,11 @@ class Battle:
         if self.message_timer > 0:
             self.message_timer -= 1
             
+        # 勝利のメッセージを出し終えたらバトルを終える（倒した敵をもう一度攻撃しない）
+        if self.enemy.hp <= 0 and self.message_timer == 0:
+            self.active = False
+            return
+            
         # Auto enemy turn after message
         if self.turn == "enemy" and self.message_timer == 60:
             self.enemy_attack()
@@ -74,14 +101,11 @@ class Battle:
             
     def victory(self):
         """勝利時の処理"""
-        # 経験値計算
-        if isinstance(self.enemy, Boss):
-            self.victory_exp = 500
-        else:
-            self.victory_exp = 50
+        # 経験値計算（敵の種類の定義から）
+        self.victory_exp = self.enemy.enemy_type.exp
             
         # アイテムドロップ
-        if isinstance(self.enemy, Boss):
+        if self.enemy.is_boss:
             # ボスは必ず鍵アイテムドロップ
             self.player.inventory.add_item("key_item", 1)
             self.victory_items.append("鍵アイテム")
@@ -90,12 +114,12 @@ class Battle:
                 self.game_state.boss_defeated = True
         else:
             # 通常敵は確率でポーションドロップ
-            if random.random() < 0.3:  # 30%の確率
+            if self.rng.random() < 0.3:  # 30%の確率
                 self.player.inventory.add_item("potion", 1)
                 self.victory_items.append("ポーション")
                 
         # ゲーム進行更新
-        if self.game_state and self.enemy.name == "スライム":
+        if self.game_state and self.enemy.type_id == QUEST_ENEMY_TYPE:
             self.game_state.defeated_slimes += 1
             
         # 経験値獲得
@@ -113,7 +137,7 @@ class Battle:
         # Draw battle UI background
         battle_box_height = 200
         battle_box_y = SCREEN_HEIGHT - battle_box_height - 20
-        pygame.draw.rect(screen, BLACK, (20, battle_box_y, SCREEN_WIDTH - 40, battle_box_height))
+        box_rect = pygame.draw.rect(screen, BLACK, (20, battle_box_y, SCREEN_WIDTH - 40, battle_box_height))
         pygame.draw.rect(screen, WHITE, (20, battle_box_y, SCREEN_WIDTH - 40, battle_box_height), 2)
         
         # Draw HP bars
@@ -123,25 +147,25 @@ class Battle:
         hp_ratio = self.player.hp / self.player.max_hp
         pygame.draw.rect(screen, WHITE, (40, battle_box_y + 20, hp_bar_width, hp_bar_height), 2)
         pygame.draw.rect(screen, GREEN, (40, battle_box_y + 20, int(hp_bar_width * hp_ratio), hp_bar_height))
-        hp_text = font.render(f"プレイヤー Lv.{self.player.level} HP: {self.player.hp}/{self.player.max_hp}", True, WHITE)
+        hp_text = render_text(font, f"プレイヤー Lv.{self.player.level} HP: {self.player.hp}/{self.player.max_hp}", WHITE)
         screen.blit(hp_text, (40, battle_box_y + 45))
         
         # Enemy HP
         enemy_hp_ratio = self.enemy.hp / self.enemy.max_hp
         pygame.draw.rect(screen, WHITE, (SCREEN_WIDTH - 240, battle_box_y + 20, hp_bar_width, hp_bar_height), 2)
         pygame.draw.rect(screen, RED, (SCREEN_WIDTH - 240, battle_box_y + 20, int(hp_bar_width * enemy_hp_ratio), hp_bar_height))
-        enemy_hp_text = font.render(f"{self.enemy.name} HP: {self.enemy.hp}/{self.enemy.max_hp}", True, WHITE)
+        enemy_hp_text = render_text(font, f"{self.enemy.name} HP: {self.enemy.hp}/{self.enemy.max_hp}", WHITE)
         screen.blit(enemy_hp_text, (SCREEN_WIDTH - 240, battle_box_y + 45))
         
         # Draw message
         if self.message:
-            msg_text = font.render(self.message, True, YELLOW)
+            msg_text = render_text(font, self.message, YELLOW)
             msg_rect = msg_text.get_rect(center=(SCREEN_WIDTH // 2, battle_box_y + 100))
             screen.blit(msg_text, msg_rect)
         
         # Draw action buttons (if player turn and no message)
         if self.turn == "player" and self.message_timer == 0 and self.player.hp > 0:
-            action_text = font.render("スペース：攻撃  H：ポーション  P：攻撃UP  D：防御UP  ESC：逃げる", True, WHITE)
+            action_text = render_text(font, "スペース：攻撃  H：ポーション  P：攻撃UP  D：防御UP  ESC：逃げる", WHITE)
             action_rect = action_text.get_rect(center=(SCREEN_WIDTH // 2, battle_box_y + 150))
             screen.blit(action_text, action_rect)
             
@@ -154,5 +178,7 @@ class Battle:
                 buff_text += f"防御力+{self.player.inventory.buffs['defense_boost']} "
             buff_text += f"(残り{self.player.inventory.buffs['buff_turns']}ターン)"
             
-            buff_render = font.render(buff_text, True, YELLOW)
-            screen.blit(buff_render, (40, battle_box_y + 75))
\ No newline at end of file
+            buff_render = render_text(font, buff_text, YELLOW)
+            screen.blit(buff_render, (40, battle_box_y + 75))
+        
+        return box_rect
\ No newline at end of file
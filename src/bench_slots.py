@@ -0,0 +1,108 @@
+"""__slots__にしたクラスのメモリと属性アクセスの速さを測る
+
+使い方:
+    python src/bench_slots.py          # 各クラス100000個
+    python src/bench_slots.py 500000
+
+同じ属性と値を__dict__に持つ普通のクラスのインスタンスと比べる。
+メモリはインスタンス本体（と__dict__）の分だけで、属性が指す値は含まない。
+"""
+import sys
+import timeit
+import tracemalloc
+from player import Player
+from enemy import EnemyPool
+from npc import NPC
+from item import Item
+from skill import Skill
+from battle import Battle
+from ui import DialogueBox
+
+
+def sample_objects():
+    """計測するクラスごとの見本のインスタンス"""
+    player = Player(0, 0)
+    pool = EnemyPool()
+    enemy = pool.spawn("slime", 0, 0)
+    return [
+        player,
+        enemy,
+        pool.spawn("dark_knight", 0, 0),
+        NPC(0, 0, "村人", "こんにちは"),
+        Item("potion", "ポーション", 50),
+        Skill("攻撃力強化", "攻撃力を恒久的に増加させる", 10),
+        Battle(player, enemy),
+        DialogueBox(),
+    ]
+
+
+def slot_names(cls):
+    """継承元を含めた__slots__の名前"""
+    names = []
+    for klass in reversed(cls.__mro__):
+        names.extend(klass.__dict__.get("__slots__", ()))
+    return names
+
+
+def copy_with_slots(obj, names):
+    """__init__を通さずに同じ属性値を持つインスタンスを作る"""
+    copy = type(obj).__new__(type(obj))
+    for name in names:
+        setattr(copy, name, getattr(obj, name))
+    return copy
+
+
+def copy_with_dict(plain, obj, names):
+    """同じ属性値を__dict__に持つ普通のクラスのインスタンスを作る"""
+    copy = plain()
+    for name in names:
+        setattr(copy, name, getattr(obj, name))
+    return copy
+
+
+def allocated(make, count):
+    """make()をcount回呼んで作ったインスタンスが使うメモリ（1個あたりのバイト数）"""
+    tracemalloc.start()
+    objects = [make() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    list_size = sys.getsizeof(objects)  # 入れ物のリストの分は除く
+    return (size - list_size) / count
+
+
+def access_time(obj, name, number=1000000):
+    """属性を1回読むのにかかる秒数（ループ自体の時間は差し引く）"""
+    loop = min(timeit.repeat("o", globals={"o": obj}, number=number, repeat=5))
+    read = min(timeit.repeat(f"o.{name}", globals={"o": obj}, number=number, repeat=5))
+    return max(0.0, read - loop) / number
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'クラス':<12} {'属性':>4} {'__dict__':>10} {'__slots__':>10} {'削減':>6}   "
+          f"{'読み出し(dict)':>14} {'読み出し(slots)':>15}")
+    total_dict = total_slots = 0
+    for obj in sample_objects():
+        cls = type(obj)
+        names = slot_names(cls)
+        plain = type(cls.__name__ + "Dict", (), {})
+        dict_object = copy_with_dict(plain, obj, names)
+        
+        dict_bytes = allocated(lambda: copy_with_dict(plain, obj, names), count)
+        slots_bytes = allocated(lambda: copy_with_slots(obj, names), count)
+        total_dict += dict_bytes
+        total_slots += slots_bytes
+        
+        # 最初の属性（xやnameなど）を読む速さ（Enemyはプロパティなので窓口のpoolを読む）
+        name = names[0]
+        dict_time = access_time(dict_object, name)
+        slots_time = access_time(obj, name)
+        print(f"{cls.__name__:<12} {len(names):>4} {dict_bytes:>8.0f}B {slots_bytes:>8.0f}B "
+              f"{(1 - slots_bytes / dict_bytes) * 100:>5.0f}%   "
+              f"{dict_time * 1e9:>11.1f}ns {slots_time * 1e9:>12.1f}ns  (.{name})")
+    print(f"{'合計':<12} {'':>4} {total_dict:>8.0f}B {total_slots:>8.0f}B "
+          f"{(1 - total_slots / total_dict) * 100:>5.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 """カメラシステムの定義"""
+import pygame
 from constants import *
 
 class Camera:
@@ -6,11 +7,18 @@ class Camera:
         self.target = target  # 追従する対象（プレイヤー）
         self.x = 0.0  # float型で精密な位置計算
         self.y = 0.0
+        self.prev_x = 0.0  # 前のティックの位置（描画の補間用）
+        self.prev_y = 0.0
+        self.render_x = 0  # 描画に使う整数の位置
+        self.render_y = 0
         self.smoothing = 0.25  # カメラの滑らかさをさらに上げる
         self.deadzone = 50  # デッドゾーン（この範囲内ならカメラが動かない）
         
     def update(self, map_width, map_height):
-        """カメラ位置を更新"""
+        """カメラ位置を更新（1ティックに1回）"""
+        self.prev_x = self.x
+        self.prev_y = self.y
+        
         # プレイヤーを画面中央に配置する位置を計算
         target_x = self.target.x - SCREEN_WIDTH // 2
         target_y = self.target.y - SCREEN_HEIGHT // 2
@@ -28,11 +36,45 @@ class Camera:
         # マップの境界内に制限
         self.x = max(0, min(self.x, map_width - SCREEN_WIDTH))
         self.y = max(0, min(self.y, map_height - SCREEN_HEIGHT))
+        self.interpolate(1.0)
+    
+    def get_state(self):
+        """カメラ位置（前のティックの位置を含む）"""
+        return {"x": self.x, "y": self.y, "prev_x": self.prev_x, "prev_y": self.prev_y}
+    
+    def restore_state(self, state):
+        """get_state()で保存した状態に戻す"""
+        self.x = state["x"]
+        self.y = state["y"]
+        self.prev_x = state["prev_x"]
+        self.prev_y = state["prev_y"]
+        self.interpolate(1.0)
+    
+    def snap(self, map_width, map_height):
+        """マップ切り替え時に滑らかさを無視して対象の位置へ移動"""
+        self.x = self.target.x - SCREEN_WIDTH // 2
+        self.y = self.target.y - SCREEN_HEIGHT // 2
+        self.x = max(0, min(self.x, map_width - SCREEN_WIDTH))
+        self.y = max(0, min(self.y, map_height - SCREEN_HEIGHT))
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.interpolate(1.0)
+    
+    def interpolate(self, alpha):
+        """前のティックと現在の位置の間を補間して描画位置を決める（alpha: 0.0〜1.0）"""
+        self.render_x = int(self.prev_x + (self.x - self.prev_x) * alpha)
+        self.render_y = int(self.prev_y + (self.y - self.prev_y) * alpha)
+    
+    def get_view_rect(self):
+        """画面に映っているワールド上の範囲"""
+        return pygame.Rect(self.render_x, self.render_y, SCREEN_WIDTH, SCREEN_HEIGHT)
     
+    # 描画位置は補間したカメラ位置を整数にしてから計算する
+    # （背景とキャラクターのずれ方を揃え、スクロール描画と1ピクセルもずれないようにする）
     def apply(self, entity_x, entity_y):
         """エンティティの描画位置を計算"""
-        return (int(entity_x - self.x), int(entity_y - self.y))
+        return (int(entity_x - self.render_x), int(entity_y - self.render_y))
     
     def apply_rect(self, rect):
         """矩形の描画位置を計算"""
-        return (int(rect.x - self.x), int(rect.y - self.y), rect.width, rect.height)
\ No newline at end of file
+        return (rect.x - self.render_x, rect.y - self.render_y, rect.width, rect.height)
\ No newline at end of file
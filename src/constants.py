@@ -7,7 +7,29 @@ VERSION = "0.02"
 SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = 800
 TILE_SIZE = 40
-FPS = 120  # フレームレートを上げる
+GRID_CELL_SIZE = TILE_SIZE * 2  # 当たり判定用グリッドのセルサイズ
+TICK_RATE = 120  # ゲームの更新回数/秒（描画のフレームレートとは独立）
+TICK_SECONDS = 1.0 / TICK_RATE  # 1ティックの長さ（秒）
+MAX_TICKS_PER_FRAME = 8  # 処理落ちしたときに1フレームで追いつくティック数の上限
+FPS = 120  # 描画のフレームレート上限（0で無制限、下げると省電力）
+
+# リプレイ（ティックごとの入力を記録し、終了時にREPLAY_DIRへ保存する）
+REPLAY_RECORDING = True
+REPLAY_DIR = "replays"
+REPLAY_KEYFRAME_INTERVAL = TICK_RATE * 10  # 途中から再生するための状態を保存する間隔
+DIRTY_RECT_RENDERING = False  # True: 変更部分だけ画面更新（低スペック向け）
+
+# 直近に訪れたマップを保持する数（再訪時に作り直さない）
+MAP_CACHE_SIZE = 3
+# 隣のマップの画像をバックグラウンドで先に読み込んでおく（遷移時に読み込み待ちで止まらない）
+MAP_PREFETCH = True
+
+# 村の東の出口から草原（maps/field.txt の画面より大きいマップ）へ行けるようにする
+WORLD_MAP = False
+
+# 画面より大きいマップはチャンク単位で読み込む
+CHUNK_TILES = 8  # チャンク1辺のタイル数
+CHUNK_LOAD_MARGIN = 1  # 画面外に先読みしておくチャンク数
 
 # マップサイズ（画面固定なので画面サイズと同じ）
 MAP_WIDTH = SCREEN_WIDTH   # マップの幅
@@ -16,13 +38,16 @@ MAP_HEIGHT = SCREEN_HEIGHT  # マップの高さ
 # キャラクターサイズ
 PLAYER_SIZE = 32
 NPC_SIZE = 24  # 少し小さく
+PORTRAIT_SIZE = (150, 150)  # 会話ウィンドウのポートレート
 ENEMY_SIZE = 40
 
 # ゲームプレイ設定
-PLAYER_SPEED_VILLAGE = 4.5  # 村での速度（速い）- 120FPS用に調整
-PLAYER_SPEED_FIELD = 2.25   # フィールドでの速度（遅い）- 120FPS用に調整
-PLAYER_SPEED_BOSS = 3.0    # ボスエリアでの速度 - 120FPS用に調整
+PLAYER_SPEED_VILLAGE = 4.5  # 村での速度（速い）- 1ティックあたり
+PLAYER_SPEED_FIELD = 2.25   # フィールドでの速度（遅い）- 1ティックあたり
+PLAYER_SPEED_BOSS = 3.0    # ボスエリアでの速度 - 1ティックあたり
 INTERACTION_DISTANCE = 50
+VIEW_MARGIN = 60  # 画面外でも名前の表示がはみ出す分は描画対象にする
+CHARACTER_COLLISION_PADDING = 5  # NPC・敵の当たり判定の余裕
 
 # 色定義
 BLACK = (0, 0, 0)
@@ -40,6 +65,25 @@ GRAY = (128, 128, 128)
 DARK_GREEN = (0, 100, 0)
 CYAN = (0, 255, 255)
 
+# 描画済み文字列のキャッシュ上限（バイト）
+TEXT_CACHE_BYTES = 8 * 1024 * 1024
+
+# 読み込んだ画像のキャッシュ上限（バイト）
+ASSET_CACHE_BYTES = 32 * 1024 * 1024
+
+# 拡大縮小した画像をピクセルのまま保存しておくフォルダ（Noneなら保存しない）
+ASSET_DISK_CACHE_DIR = ".cache/assets"
+
+# 起動時にすべてのマップのNPCの画像を並列にデコードしておく
+ASSET_PRELOAD = True
+ASSET_PRELOAD_WORKERS = 0  # デコードするプロセス数（0ならCPUのコア数）
+
+# スプライトとポートレートをまとめたアトラス（python src/atlas_builder.py で作る）
+ATLAS_DIR = "assets/atlas"
+ATLAS_INDEX_PATH = ATLAS_DIR + "/atlas.json"
+ATLAS_PAGE_SIZE = 2048  # アトラス画像1枚の最大の幅と高さ
+ATLAS_PADDING = 1  # 画像どうしの間隔
+
 # フォントパス
 FONT_PATH = "C:/Windows/Fonts/meiryo.ttc"
 FONT_SIZE = 20
\ No newline at end of file
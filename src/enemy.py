@@ -1,105 +1,191 @@
 """敵クラスの定義"""
 import pygame
 import math
-from constants import *
+import numpy as np
+from text_cache import render_text
+from enemy_types import ENEMY_TYPES, ENEMY_TYPE_IDS
+
+class EnemyPool:
+    """マップ上の敵のステータスを項目ごとの配列で持つ（多数の敵をまとめて更新・検索できる）
+
+    1体ずつの操作はspawn()が返すEnemy（配列の添字を持つだけの窓口）から行う
+    """
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.hp = np.zeros(capacity, dtype=np.int32)
+        self.max_hp = np.zeros(capacity, dtype=np.int32)
+        self.attack = np.zeros(capacity, dtype=np.int32)
+        self.defense = np.zeros(capacity, dtype=np.int32)
+        self.size = np.zeros(capacity, dtype=np.int32)
+        self.type_id = np.zeros(capacity, dtype=np.int16)
+        self.handles = []  # 添字 -> Enemy
+
+    def grow(self):
+        """配列の容量を倍にする"""
+        for name in ("x", "y", "hp", "max_hp", "attack", "defense", "size", "type_id"):
+            old = getattr(self, name)
+            new = np.zeros(len(old) * 2, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, type_key, x, y):
+        """種類の名前（data/enemies.jsonのkey）を指定して敵を出現させる"""
+        enemy_type = ENEMY_TYPES[ENEMY_TYPE_IDS[type_key]]
+        if self.count == len(self.x):
+            self.grow()
+        index = self.count
+        self.count += 1
+        self.x[index] = x
+        self.y[index] = y
+        self.hp[index] = enemy_type.hp
+        self.max_hp[index] = enemy_type.hp
+        self.attack[index] = enemy_type.attack
+        self.defense[index] = enemy_type.defense
+        self.size[index] = enemy_type.size
+        self.type_id[index] = enemy_type.type_id
+        enemy = (Boss if enemy_type.is_boss else Enemy)(self, index)
+        self.handles.append(enemy)
+        return enemy
+
+    def alive(self):
+        """生きている敵はTrueの配列"""
+        return self.hp[:self.count] > 0
+
+    def within(self, x, y, distance):
+        """点(x, y)から中心までの距離がdistance未満の生きている敵（出現順）"""
+        n = self.count
+        half = self.size[:n] / 2
+        dx = self.x[:n] + half - x
+        dy = self.y[:n] + half - y
+        near = (dx * dx + dy * dy < distance * distance) & self.alive()
+        return [self.handles[i] for i in np.flatnonzero(near)]
+
 
 class Enemy:
-    def __init__(self, x, y, name="スライム", enemy_type="slime"):
-        self.x = x
-        self.y = y
-        self.size = ENEMY_SIZE
-        self.name = name
-        self.enemy_type = enemy_type
-        
-        # 敵の種類によってステータスを設定
-        if enemy_type == "slime":
-            self.hp = 50
-            self.max_hp = 50
-            self.attack = 15
-            self.defense = 0
-            self.color = PURPLE
-        elif enemy_type == "goblin":
-            self.hp = 80
-            self.max_hp = 80
-            self.attack = 20
-            self.defense = 2
-            self.color = GREEN
-        elif enemy_type == "orc":
-            self.hp = 120
-            self.max_hp = 120
-            self.attack = 25
-            self.defense = 5
-            self.color = DARK_GREEN
-        elif enemy_type == "ghost":
-            self.hp = 100
-            self.max_hp = 100
-            self.attack = 30
-            self.defense = 0
-            self.color = LIGHT_BLUE
-        else:
-            # デフォルト
-            self.hp = 50
-            self.max_hp = 50
-            self.attack = 15
-            self.defense = 0
-            self.color = PURPLE
-        
-    def draw(self, screen, font):
-        pygame.draw.rect(screen, self.color, (self.x, self.y, self.size, self.size))
-        # Draw enemy name
-        name_text = font.render(self.name, True, WHITE)
-        name_rect = name_text.get_rect(center=(self.x + self.size // 2, self.y - 10))
-        screen.blit(name_text, name_rect)
+    """EnemyPoolの1体分を扱う窓口（ステータスはプールの配列にある）"""
+    # 窓口自体は添字などを持つだけなので__dict__を持たせない
+    __slots__ = ("pool", "index", "enemy_type", "colliders")
     
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.enemy_type = ENEMY_TYPES[pool.type_id[index]]
+        self.colliders = None  # 登録先の当たり判定（マップが設定）
+
+    # 配列の値はPythonの数値にして返す（描画やメッセージ、状態の保存でそのまま使える）
+    @property
+    def x(self):
+        return int(self.pool.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.pool.x[self.index] = value
+
+    @property
+    def y(self):
+        return int(self.pool.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.pool.y[self.index] = value
+
+    @property
+    def hp(self):
+        return int(self.pool.hp[self.index])
+
+    @hp.setter
+    def hp(self, value):
+        self.pool.hp[self.index] = value
+
+    @property
+    def max_hp(self):
+        return int(self.pool.max_hp[self.index])
+
+    @property
+    def attack(self):
+        return int(self.pool.attack[self.index])
+
+    @attack.setter
+    def attack(self, value):
+        self.pool.attack[self.index] = value
+
+    @property
+    def defense(self):
+        return int(self.pool.defense[self.index])
+
+    @defense.setter
+    def defense(self, value):
+        self.pool.defense[self.index] = value
+
+    @property
+    def size(self):
+        return int(self.pool.size[self.index])
+
+    @property
+    def type_id(self):
+        return self.enemy_type.type_id
+
+    @property
+    def name(self):
+        return self.enemy_type.name
+
+    @property
+    def color(self):
+        return self.enemy_type.color
+
+    @property
+    def is_boss(self):
+        return self.enemy_type.is_boss
+
+    def draw(self, screen, font):
+        return self.draw_at_position(screen, font, self.x, self.y)
+
     def draw_at_position(self, screen, font, x, y):
-        pygame.draw.rect(screen, self.color, (x, y, self.size, self.size))
+        body_rect = pygame.draw.rect(screen, self.color, (x, y, self.size, self.size))
         # Draw enemy name
-        name_text = font.render(self.name, True, WHITE)
+        name_text = render_text(font, self.name, self.enemy_type.name_color)
         name_rect = name_text.get_rect(center=(x + self.size // 2, y - 10))
-        screen.blit(name_text, name_rect)
-    
+        return body_rect.union(screen.blit(name_text, name_rect))
+
     def get_center(self):
         return (self.x + self.size // 2, self.y + self.size // 2)
-    
+
     def get_distance_to(self, player):
         px, py = player.get_center()
         ex, ey = self.get_center()
         return math.sqrt((px - ex)**2 + (py - ey)**2)
-    
+
+    def get_attack_damage(self):
+        """攻撃力を返す"""
+        return self.attack
+
     def take_damage(self, damage):
         self.hp = max(0, self.hp - damage)
+        if self.hp == 0:
+            self.defeat()
         return self.hp > 0  # Returns True if still alive
 
+    def defeat(self):
+        """倒された状態にして当たり判定から外す"""
+        self.hp = 0
+        if self.colliders is not None:
+            self.colliders.remove(self)
+
 class Boss(Enemy):
     """中ボスクラス"""
-    def __init__(self, x, y, name="闇の騎士"):
-        super().__init__(x, y, name)
-        self.size = ENEMY_SIZE + 20  # ボスは大きめ
-        self.hp = 150  # HPを200から150に減らす
-        self.max_hp = 150
-        self.attack = 20  # 攻撃力を少し下げる
-        self.defense = 3  # 防御力も調整
+    __slots__ = ("phase", "special_attack_cooldown")
+    
+    def __init__(self, pool, index):
+        super().__init__(pool, index)
         self.phase = 1  # 戦闘フェーズ
         self.special_attack_cooldown = 0
-        
-    def draw(self, screen, font):
-        # ボスは濃い赤色
-        pygame.draw.rect(screen, DARK_RED, (self.x, self.y, self.size, self.size))
-        # Draw boss name
-        name_text = font.render(self.name, True, YELLOW)
-        name_rect = name_text.get_rect(center=(self.x + self.size // 2, self.y - 10))
-        screen.blit(name_text, name_rect)
-        
-    def draw_at_position(self, screen, font, x, y):
-        pygame.draw.rect(screen, DARK_RED, (x, y, self.size, self.size))
-        # Draw boss name
-        name_text = font.render(self.name, True, YELLOW)
-        name_rect = name_text.get_rect(center=(x + self.size // 2, y - 10))
-        screen.blit(name_text, name_rect)
-        
+
     def get_attack_damage(self):
         """フェーズに応じた攻撃力を返す"""
-        if self.hp < self.max_hp * 0.3:  # HP30%以下
+        enemy_type = self.enemy_type
+        if self.hp < self.max_hp * enemy_type.rage_threshold:  # HP30%以下
             self.phase = 2
-            return int(self.attack * 1.3)  # 攻撃力1.3倍に調整
-        return self.attack
\ No newline at end of file
+            return int(self.attack * enemy_type.rage_multiplier)  # 攻撃力1.3倍に調整
+        return self.attack
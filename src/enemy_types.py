@@ -0,0 +1,47 @@
+"""敵の種類（data/enemies.jsonから読み込む）の定義"""
+import json
+import os
+import constants
+from constants import *
+
+# 敵の種類の定義ファイル（idは0からの連番で、配列の添字として使う）
+ENEMY_TYPES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "enemies.json")
+
+
+class EnemyType:
+    """敵の種類ごとの基本ステータス"""
+    def __init__(self, id, key, name, hp, attack, defense, color, size=ENEMY_SIZE,
+                 name_color="WHITE", exp=50, story_exp=30, is_boss=False,
+                 rage_threshold=0.0, rage_multiplier=1.0, symbol=None):
+        self.type_id = id
+        self.key = key  # マップファイルやコードから指定する名前
+        self.name = name  # 画面に表示する名前
+        self.symbol = symbol  # マップファイルでの出現位置の記号（なければ置けない）
+        self.hp = hp
+        self.attack = attack
+        self.defense = defense
+        # 色は constants.py の色の名前で書く
+        self.color = getattr(constants, color)
+        self.name_color = getattr(constants, name_color)
+        self.size = size
+        self.exp = exp  # 戦闘で倒したときの経験値
+        self.story_exp = story_exp  # ストーリーモードで話しかけて倒したときの経験値
+        self.is_boss = is_boss
+        # HPがrage_threshold未満になると攻撃力がrage_multiplier倍になる（ボス）
+        self.rage_threshold = rage_threshold
+        self.rage_multiplier = rage_multiplier
+
+
+def load_enemy_types(path=ENEMY_TYPES_PATH):
+    """定義ファイルから敵の種類のリスト（添字＝種類ID）を読み込む"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    enemy_types = [EnemyType(**entry) for entry in data["enemies"]]
+    for type_id, enemy_type in enumerate(enemy_types):
+        if enemy_type.type_id != type_id:
+            raise ValueError(f"{path}: {enemy_type.key} のidは{type_id}にしてください（0からの連番）")
+    return enemy_types
+
+
+ENEMY_TYPES = load_enemy_types()
+ENEMY_TYPE_IDS = {enemy_type.key: enemy_type.type_id for enemy_type in ENEMY_TYPES}
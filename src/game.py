@@ -0,0 +1,298 @@
+"""ゲームの状態と1ティック分の更新処理（描画はmain.pyが行う）"""
+import random
+import pygame
+from constants import *
+from player import Player
+from map import MapManager
+from ui import DialogueBox
+from battle import Battle, QUEST_ENEMY_TYPE
+from camera import Camera
+from game_state import GameState
+
+class Game:
+    """描画のフレームレートに関係なく、TICK_RATE回/秒の固定間隔で進むゲームの状態"""
+    def __init__(self, headless=False, seed=None, map_asset_keys=None, prefetch=MAP_PREFETCH):
+        # 乱数はゲームごとに持つ（同じ種と入力なら同じ結果になり、リプレイできる）
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        # ゲームオブジェクト作成（headlessなら画像の読み込みなど描画の準備をしない）
+        self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        self.game_state = GameState()
+        self.current_map_id = 0
+        # map_asset_keysはマップごとの画像のキー（main.pyで起動時に調べたもの）、prefetchは隣のマップの先読み
+        self.map_manager = MapManager(headless=headless, map_asset_keys=map_asset_keys, prefetch=prefetch)
+        self.current_map = self.map_manager.get(self.current_map_id)
+        self.dialogue_box = DialogueBox()
+        self.battle = None
+        # カメラ（画面と同じ大きさのマップでは常に原点のまま）
+        self.camera = Camera(self.player)
+        self.running = True
+        self.space_pressed = False
+        self.tick_count = 0  # 経過ティック数
+    
+    def change_map(self, map_id, x=None, y=None):
+        """map_idのマップへ移り、プレイヤーを(x, y)に置く（Noneの座標は今の値のまま）
+        
+        位置は移った先のマップの範囲に収め、障害物と重なるときは遷移した辺に沿って空いている場所へずらす
+        """
+        self.current_map_id = map_id
+        self.current_map = self.map_manager.get(map_id)
+        self.battle = None  # バトルの相手は前のマップの敵なので持ち越さない
+        player = self.player
+        player.set_speed_for_map(map_id)
+        player.set_map_bounds(self.current_map.width, self.current_map.height)
+        
+        # 東西の遷移（xを指定）なら縦に、南北の遷移なら横にずらして探す
+        along_y = x is not None
+        max_x = self.current_map.width - player.size
+        max_y = self.current_map.height - player.size
+        x = max(0, min(player.x if x is None else x, max_x))
+        y = max(0, min(player.y if y is None else y, max_y))
+        for distance in range(0, max(max_x, max_y) + 1, TILE_SIZE):
+            for offset in ((0,) if distance == 0 else (distance, -distance)):
+                candidate_x = x if along_y else x + offset
+                candidate_y = y + offset if along_y else y
+                if not (0 <= candidate_x <= max_x and 0 <= candidate_y <= max_y):
+                    continue
+                rect = pygame.Rect(int(candidate_x), int(candidate_y), player.size, player.size)
+                if not player.is_blocked(rect, obstacle_grid=self.current_map.obstacle_grid,
+                                         colliders=self.current_map.colliders):
+                    player.x, player.y = candidate_x, candidate_y
+                    return
+        player.x, player.y = x, y  # 空いている場所がなければそのまま置く
+    
+    def snapshot(self):
+        """ゲーム全体の状態（JSONにできる値だけ）を返す"""
+        battle = None
+        # 保存するのは今のマップの敵と戦っている最中のバトルだけ（敵はマップ内の番号で持つ）
+        if self.battle and self.battle.active and self.battle.enemy in self.current_map.enemies:
+            battle = self.battle.get_state()
+            battle["enemy"] = self.current_map.enemies.index(self.battle.enemy)
+        return {
+            "tick_count": self.tick_count,
+            "rng": self.rng.getstate(),
+            "current_map_id": self.current_map_id,
+            "maps": self.map_manager.get_state(),
+            "player": self.player.get_state(),
+            "game_state": self.game_state.get_state(),
+            "camera": self.camera.get_state(),
+            "dialogue": self.dialogue_box.get_state(),
+            "battle": battle,
+        }
+    
+    def restore(self, state):
+        """snapshot()の状態に戻す（JSONから読み込んだものでもよい）"""
+        self.tick_count = state["tick_count"]
+        version, internal, gauss = state["rng"]
+        self.rng.setstate((version, tuple(internal), gauss))
+        self.current_map_id = state["current_map_id"]
+        self.map_manager.restore_state(state["maps"])
+        self.current_map = self.map_manager.get(self.current_map_id)
+        self.player.restore_state(state["player"])
+        self.game_state.restore_state(state["game_state"])
+        self.camera.restore_state(state["camera"])
+        # ポートレートは話し相手のNPCから取り直す
+        portrait = None
+        for npc in self.current_map.npcs:
+            if npc.name == state["dialogue"]["speaker"]:
+                portrait = npc.portrait
+        self.dialogue_box.restore_state(state["dialogue"], portrait)
+        self.battle = None
+        if state["battle"]:
+            enemy = self.current_map.enemies[state["battle"]["enemy"]]
+            self.battle = Battle(self.player, enemy, self.game_state, self.rng)
+            self.battle.restore_state(state["battle"])
+        self.space_pressed = False
+    
+    def handle_key(self, key):
+        """キーが押されたときの処理"""
+        if key == pygame.K_SPACE:
+            self.space_pressed = True
+        elif key == pygame.K_ESCAPE and self.battle and self.battle.active:
+            self.battle.active = False
+            self.battle.message = "逃げ出した！"
+            self.battle.message_timer = 60
+        elif key == pygame.K_h:  # Hキーで回復
+            if self.battle and self.battle.active and self.battle.turn == "player" and self.battle.message_timer == 0:
+                # バトル中のポーション使用
+                if self.player.inventory.get_count("potion") > 0:
+                    result = self.player.inventory.use_item("potion", self.player)
+                    if result:
+                        self.battle.message = result
+                        self.battle.message_timer = 120
+                        self.battle.turn = "enemy"  # ターンを敵に渡す
+                elif self.player.inventory.get_count("super_potion") > 0:
+                    result = self.player.inventory.use_item("super_potion", self.player)
+                    if result:
+                        self.battle.message = result
+                        self.battle.message_timer = 120
+                        self.battle.turn = "enemy"
+            elif not self.battle:
+                # 通常時のポーション使用
+                if self.player.inventory.get_count("potion") > 0:
+                    result = self.player.inventory.use_item("potion", self.player)
+                    if result:
+                        self.dialogue_box.show("システム", [result])
+        elif key == pygame.K_p and self.battle and self.battle.active and self.battle.turn == "player" and self.battle.message_timer == 0:
+            # Pキーで攻撃力UP
+            if self.player.inventory.get_count("power_up") > 0:
+                result = self.player.inventory.use_item("power_up", self.player)
+                if result:
+                    self.battle.message = result
+                    self.battle.message_timer = 120
+                    self.battle.turn = "enemy"
+        elif key == pygame.K_d and self.battle and self.battle.active and self.battle.turn == "player" and self.battle.message_timer == 0:
+            # Dキーで防御力UP
+            if self.player.inventory.get_count("defense_up") > 0:
+                result = self.player.inventory.use_item("defense_up", self.player)
+                if result:
+                    self.battle.message = result
+                    self.battle.message_timer = 120
+                    self.battle.turn = "enemy"
+        elif key == pygame.K_s and not self.battle and not self.dialogue_box.active:
+            # Sキーでスキルメニュー
+            skill_messages = []
+            skill_messages.append(f"スキルポイント: {self.player.skills.skill_points}")
+            skill_messages.append("")
+            for skill_name, skill in self.player.skills.skills.items():
+                skill_messages.append(f"{skill.name} Lv.{skill.level}/{skill.max_level}")
+                skill_messages.append(f"  {skill.description}")
+            skill_messages.append("")
+            skill_messages.append("スキルポイントはレベルアップ時に獲得できます")
+            self.dialogue_box.show("スキルメニュー", skill_messages)
+    
+    def update(self, keys, pressed_keys=()):
+        """1ティック分ゲームを進める（keys: 押されているキー、pressed_keys: 前のティック以降に押されたキー）"""
+        # 描画の補間用に、このティックの前の位置を覚えておく
+        self.player.save_position()
+        for key in pressed_keys:
+            self.handle_key(key)
+        # 終わったバトル（逃げた後など）は片付ける
+        if self.battle and not self.battle.active:
+            self.battle = None
+        
+        if self.battle and self.battle.active:
+            # バトルモード
+            self.battle.update()
+            if self.space_pressed and self.battle.turn == "player" and self.battle.message_timer == 0:
+                self.battle.player_attack()
+        elif not self.dialogue_box.active:
+            # 通常モード
+            # マップの障害物とNPC・敵の当たり判定はマップが保持している
+            self.player.move(keys, obstacle_grid=self.current_map.obstacle_grid,
+                             colliders=self.current_map.colliders)
+            
+            # プレイヤーの移動速度と移動範囲をマップに応じて設定
+            self.player.set_speed_for_map(self.current_map_id)
+            self.player.set_map_bounds(self.current_map.width, self.current_map.height)
+            previous_map = self.current_map
+            
+            # マップ遷移（移った先のマップの範囲と障害物に合わせて位置を決める）
+            if self.player.y <= 0 and self.current_map_id == 0:  # 村から北へ
+                self.change_map(1, y=SCREEN_HEIGHT - self.player.size - 10)
+            elif self.player.y >= SCREEN_HEIGHT - self.player.size and self.current_map_id == 1:  # 森から南へ
+                self.change_map(0, y=10)
+            elif self.player.y <= 0 and self.current_map_id == 1 and self.game_state.defeated_slimes >= 3:  # 森から北（ボスエリア）へ
+                self.change_map(2, y=SCREEN_HEIGHT - self.player.size - 150)
+            elif self.player.y >= SCREEN_HEIGHT - self.player.size and self.current_map_id == 2:  # ボスエリアから南へ
+                self.change_map(1, y=10)
+            elif WORLD_MAP and self.player.x >= SCREEN_WIDTH - self.player.size and self.current_map_id == 0:  # 村から東（草原）へ
+                self.change_map(3, x=10)
+            elif self.player.x <= 0 and self.current_map_id == 3:  # 草原から西（村）へ
+                self.change_map(0, x=SCREEN_WIDTH - self.player.size - 10)
+            
+            # マップが切り替わったらカメラを新しい位置へ合わせる（補間もしない）
+            if self.current_map is not previous_map:
+                self.player.save_position()
+                self.camera.snap(self.current_map.width, self.current_map.height)
+            
+            # NPC との対話チェック
+            if self.space_pressed:
+                for npc in self.current_map.npcs:
+                    if npc.get_distance_to(self.player) < INTERACTION_DISTANCE:
+                        # 特別なNPCの対話処理
+                        if npc.name == "商人":
+                            # 商人の場合、アイテムを販売
+                            if self.game_state.story_mode and not self.game_state.got_items_from_merchant:
+                                # ストーリーモードなら特別アイテムを提供
+                                dialogue = ["いらっしゃい！", 
+                                          "ストーリーモードのお客様へ特別サービス！",
+                                          "強化アイテムを無料で差し上げます！"]
+                                # アイテムを追加
+                                self.player.inventory.add_item("super_potion", 2)
+                                self.player.inventory.add_item("power_up", 2)
+                                self.player.inventory.add_item("defense_up", 2)
+                                dialogue.append("スーパーポーションx2、攻撃UP x2、防御UP x2 を入手！")
+                                dialogue.append("闇の騎士に挑戦する前に使ってくださいね！")
+                                self.game_state.got_items_from_merchant = True
+                            elif self.game_state.story_mode and self.game_state.got_items_from_merchant:
+                                dialogue = ["もう強化アイテムをお渡ししましたね！",
+                                          "闇の騎士は強敵です。",
+                                          "バトル中にアイテムを使うのを忘れずに！",
+                                          "H:ポーション P:攻撃UP D:防御UP"]
+                            else:
+                                # 通常モードの商品販売
+                                dialogue = ["いらっしゃい！何かお探しですか？",
+                                          "ポーションは50G、スーパーポーションは100Gです！"]
+                            self.dialogue_box.show(npc.name, dialogue, npc.portrait)
+                        elif npc.name == "村長":
+                            if not self.game_state.talked_to_elder:
+                                dialogue = ["ようこそ、我が村へ！", 
+                                          "実は困ったことがあってな...",
+                                          "北の森にモンスターが増えてしまった。",
+                                          "まずはスライムを3体倒してくれないか？"]
+                                self.game_state.talked_to_elder = True
+                                self.game_state.got_quest = True
+                            elif self.game_state.defeated_slimes < 3:
+                                dialogue = [f"スライムを{self.game_state.defeated_slimes}/3体倒したな。",
+                                          "あと{3 - self.game_state.defeated_slimes}体頼む！"]
+                            elif not self.game_state.boss_defeated:
+                                dialogue = ["よくやった！スライムを倒してくれたな！",
+                                          "しかし森の奥にはもっと強い魔物がいる...",
+                                          "闇の騎士と呼ばれる中ボスだ。",
+                                          "準備ができたら挑戦してみてくれ！"]
+                            else:
+                                dialogue = ["素晴らしい！闇の騎士を倒してくれたのか！",
+                                          "君は真の勇者だ！"]
+                            self.dialogue_box.show(npc.name, dialogue, npc.portrait)
+                        else:
+                            self.dialogue_box.show(npc.name, npc.dialogue, npc.portrait)
+                        break
+                
+                # 敵との戦闘チェック（近くの生きている敵を配列からまとめて探す）
+                for enemy in self.current_map.enemy_pool.within(*self.player.get_center(), INTERACTION_DISTANCE):
+                    # ストーリーモードなら全ての戦闘をスキップ
+                    if self.game_state.story_mode:
+                        # 経験値は敵の種類の定義から
+                        exp_gain = enemy.enemy_type.story_exp
+                        dialogue = [f"ストーリーモード: {enemy.name}を倒した！",
+                                  f"{exp_gain}の経験値を獲得！"]
+                        if enemy.is_boss:
+                            self.game_state.boss_defeated = True
+                            dialogue.append("おめでとう！ゲームクリア！")
+                        elif enemy.type_id == QUEST_ENEMY_TYPE:
+                            if self.game_state.defeated_slimes < 3:
+                                self.game_state.defeated_slimes += 1
+                        
+                        # 経験値獲得とレベルアップ処理
+                        level_up_messages = self.player.gain_exp(exp_gain)
+                        dialogue.extend(level_up_messages)
+                        
+                        enemy.defeat()  # 敵を倒した状態にする
+                        self.dialogue_box.show("システム", dialogue)
+                    else:
+                        # 通常の戦闘開始
+                        self.battle = Battle(self.player, enemy, self.game_state, self.rng)
+                        self.battle.start()
+                    break
+        else:
+            # ダイアログモード
+            if self.space_pressed:
+                if not self.dialogue_box.next_line():
+                    self.dialogue_box.hide()
+        
+        self.space_pressed = False
+        
+        # カメラもティックごとに動かす（描画側は前後のティックの間を補間する）
+        self.camera.update(self.current_map.width, self.current_map.height)
+        self.tick_count += 1
@@ -1,7 +1,10 @@
 """ゲームの進行状態を管理"""
+from observable import Observable
 
-class GameState:
+class GameState(Observable):
     def __init__(self):
+        self.listeners = []  # 進行状態の変更を知らせる先（HUDなど）
+        
         # ストーリー進行フラグ
         self.talked_to_elder = False      # 村長と話したか
         self.got_quest = False           # クエストを受けたか
@@ -17,6 +20,22 @@ class GameState:
         self.story_mode = True           # True: 雑魚戦をスキップして会話のみ進める
         self.skip_battles_until_boss = True  # 中ボスまでバトルをスキップ
         
+    def __setattr__(self, name, value):
+        # フラグはゲーム中のあちこちから直接書き換えられるので、値が変わったら知らせる
+        changed = name != "listeners" and getattr(self, name, value) != value
+        super().__setattr__(name, value)
+        if changed:
+            self.notify_changed()
+    
+    def get_state(self):
+        """進行フラグをまとめた状態"""
+        return {name: value for name, value in vars(self).items() if name != "listeners"}
+    
+    def restore_state(self, state):
+        """get_state()で保存した状態に戻す"""
+        for name, value in state.items():
+            setattr(self, name, value)
+    
     def update_phase(self):
         """進行状況に応じてフェーズを更新"""
         if self.boss_defeated:
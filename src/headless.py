@@ -0,0 +1,106 @@
+"""画面を使わずにゲームの処理だけを動かすヘッドレスモード（CIやバランス調整用）
+
+使い方:
+    python src/headless.py            # デモ用の入力で動かし、1秒あたりのティック数を表示
+    python src/headless.py 100000     # ティック数を指定
+
+プログラムから使う場合:
+    runner = HeadlessRunner()
+    runner.hold(pygame.K_UP)
+    runner.step(120)  # 1秒分（TICK_RATE回）進める
+    runner.press(pygame.K_SPACE)
+    runner.step()
+"""
+import os
+import sys
+import time
+import pygame
+from constants import *
+from game import Game
+
+# デモ用の入力 [(ティック数, 押し続けるキー, 最初のティックで押すキー), ...]
+DEMO_SCRIPT = [
+    (25, [pygame.K_RIGHT], []),
+    (100, [pygame.K_UP], []),     # 村から森へ
+    (60, [pygame.K_DOWN], []),    # 森から村へ
+    (200, [pygame.K_RIGHT], []),  # 村から草原へ（WORLD_MAPのときだけ。それ以外は村の東端で止まる）
+    (150, [pygame.K_RIGHT, pygame.K_DOWN], []),
+    (300, [pygame.K_LEFT], []),   # 草原から村へ
+]
+
+
+def init_headless():
+    """画面・音声にSDLのダミードライバーを使う（pygameの初期化より前に呼ぶ）"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+
+class KeyState:
+    """pygame.key.get_pressed()の代わりに、押されているキーを持つ"""
+    def __init__(self, held=()):
+        self.held = set(held)
+    
+    def __getitem__(self, key):
+        return key in self.held
+
+
+class HeadlessRunner:
+    """Gameを描画なしで、CPUが許す限りの速さでティックごとに進める"""
+    def __init__(self, game=None):
+        init_headless()
+        self.game = game or Game(headless=True)
+        self.keys = KeyState()
+        self.pressed_keys = []  # 次のティックで処理するキー入力
+    
+    def hold(self, *keys):
+        """キーを押しっぱなしにする"""
+        self.keys.held.update(keys)
+    
+    def release(self, *keys):
+        """キーを離す（指定しなければすべて）"""
+        if keys:
+            self.keys.held.difference_update(keys)
+        else:
+            self.keys.held.clear()
+    
+    def press(self, key):
+        """次のティックでキーを1回押す"""
+        self.pressed_keys.append(key)
+    
+    def step(self, ticks=1):
+        """指定ティック数だけ進める（ゲームが終了したら止まる）"""
+        for _ in range(ticks):
+            if not self.game.running:
+                break
+            self.game.update(self.keys, self.pressed_keys)
+            self.pressed_keys = []
+    
+    def run_script(self, script):
+        """入力の台本どおりに進める（形式はDEMO_SCRIPTと同じ）"""
+        for ticks, held, pressed in script:
+            self.keys.held = set(held)
+            for key in pressed:
+                self.press(key)
+            self.step(ticks)
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    runner = HeadlessRunner()
+    script_ticks = sum(t for t, _, _ in DEMO_SCRIPT)
+    
+    start = time.perf_counter()
+    while runner.game.tick_count < ticks and runner.game.running:
+        runner.run_script(DEMO_SCRIPT)
+    elapsed = time.perf_counter() - start
+    
+    game = runner.game
+    player = game.player
+    print(f"{game.tick_count}ティック（台本{script_ticks}ティック）を{elapsed:.2f}秒で実行: "
+          f"{game.tick_count / elapsed:.0f}ティック/秒（実時間の{game.tick_count / TICK_RATE / elapsed:.0f}倍）")
+    print(f"マップ: {game.current_map_id}  位置: ({player.x:.1f}, {player.y:.1f})  "
+          f"HP: {player.hp}/{player.max_hp}  Lv.{player.level}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""画面上部のステータス表示（HUD）の定義"""
+import pygame
+from constants import *
+from text_cache import render_text
+
+class HUD:
+    """ステータス表示を行ごとのサーフェスにしてキャッシュし、値が変わったときだけ描き直す
+    
+    行ごとに別のサーフェスと位置を持つので、差分矩形の描画では文字のある所だけが更新される
+    """
+    def __init__(self, font, player, game_state):
+        self.font = font
+        self.player = player
+        self.game_state = game_state
+        self.map_name = ""
+        self.hint_visible = True
+        self.lines = []  # 描画済みの行 (サーフェス, 画面上の位置)
+        self.dirty = True
+        # 表示している値の持ち主から変更を知らせてもらう
+        for source in (player, player.inventory, player.skills, game_state):
+            source.add_listener(self.invalidate)
+    
+    def invalidate(self):
+        """次の描画で描き直す"""
+        self.dirty = True
+    
+    def set_map_name(self, map_name):
+        if map_name != self.map_name:
+            self.map_name = map_name
+            self.dirty = True
+    
+    def set_hint_visible(self, visible):
+        """操作ヒントの表示切り替え（会話中・戦闘中は隠す）"""
+        if visible != self.hint_visible:
+            self.hint_visible = visible
+            self.dirty = True
+    
+    def render(self):
+        """HUDの各行を描いて、画面と同じピクセル形式にしておく"""
+        font = self.font
+        player = self.player
+        inventory = player.inventory
+        game_state = self.game_state
+        lines = []  # (描画済み文字列, 画面上の位置)
+        
+        # マップ名表示
+        lines.append((render_text(font, f"現在地: {self.map_name}", WHITE), (10, 10)))
+        
+        # ステータス表示
+        lines.append((render_text(font, f"Lv.{player.level} HP:{player.hp}/{player.max_hp} ポーション:{inventory.get_count('potion')}個 SP:{player.skills.skill_points}", WHITE), (10, 40)))
+        
+        # 経験値表示
+        lines.append((render_text(font, f"EXP: {player.exp}/{player.exp_to_next_level}", WHITE), (10, 70)))
+        
+        # アイテム数表示
+        if inventory.get_count('super_potion') > 0 or inventory.get_count('power_up') > 0 or inventory.get_count('defense_up') > 0:
+            item_text = "アイテム: "
+            if inventory.get_count('super_potion') > 0:
+                item_text += f"スーパーポーション:{inventory.get_count('super_potion')} "
+            if inventory.get_count('power_up') > 0:
+                item_text += f"攻撃UP:{inventory.get_count('power_up')} "
+            if inventory.get_count('defense_up') > 0:
+                item_text += f"防御UP:{inventory.get_count('defense_up')} "
+            lines.append((render_text(font, item_text, WHITE), (10, 100)))
+        
+        # ストーリーモード表示
+        if game_state.story_mode:
+            lines.append((render_text(font, "[ストーリーモード] 雑魚戦スキップ", CYAN), (SCREEN_WIDTH - 250, 40)))
+        
+        # 現在の目標表示
+        game_state.update_phase()
+        lines.append((render_text(font, f"目標: {game_state.get_current_objective()}", YELLOW), (10, 130)))
+        
+        # 操作ヒント
+        if self.hint_visible:
+            lines.append((render_text(font, "Hキー：ポーション使用 Sキー：スキルメニュー", WHITE), (SCREEN_WIDTH - 280, 10)))
+        
+        # 文字列のキャッシュは共有なので、変換したコピーを持つ（画面がなければそのまま）
+        if pygame.display.get_surface():
+            lines = [(text.convert_alpha(), position) for text, position in lines]
+        self.lines = lines
+        # 描画中の update_phase による通知は今回の描き直しに含まれている
+        self.dirty = False
+    
+    def draw(self, screen):
+        """HUDを描画して、描画した行ごとの領域のリストを返す"""
+        if self.dirty:
+            self.render()
+        return [screen.blit(text, position) for text, position in self.lines]
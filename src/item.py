@@ -1,14 +1,16 @@
 """アイテムクラスの定義"""
 import pygame
-from constants import *
+from observable import Observable
 
 class Item:
+    __slots__ = ("type", "name", "value")
+    
     def __init__(self, item_type, name, value):
         self.type = item_type  # "potion", "key_item" など
         self.name = name
         self.value = value  # 回復量など
         
-class Inventory:
+class Inventory(Observable):
     def __init__(self):
         self.items = {
             "potion": 3,  # 初期ポーション3個
@@ -23,12 +25,32 @@ class Inventory:
             "defense_boost": 0,  # 防御力ブースト量
             "buff_turns": 0  # バフ残りターン数
         }
+        # 所持数の変更を知らせる先（HUDなど）
+        self.listeners = []
         
+    def get_state(self):
+        """所持数とバフの状態"""
+        return {"items": dict(self.items), "buffs": dict(self.buffs)}
+    
+    def restore_state(self, state):
+        """get_state()で保存した状態に戻す"""
+        self.items = dict(state["items"])
+        self.buffs = dict(state["buffs"])
+        self.notify_changed()
+    
     def use_item(self, item_type, player):
         """アイテムを使用"""
         if self.items.get(item_type, 0) <= 0:
             return None
-            
+        
+        message = self.apply_item(item_type, player)
+        if message:
+            # 所持数とHPが変わったことを知らせる
+            self.notify_changed()
+        return message
+    
+    def apply_item(self, item_type, player):
+        """アイテムの効果を適用してメッセージを返す"""
         if item_type == "potion":
             # ポーション使用
             heal_amount = 50
@@ -66,6 +88,7 @@ class Inventory:
             self.items[item_type] += count
         else:
             self.items[item_type] = count
+        self.notify_changed()
             
     def has_item(self, item_type):
         """アイテムを持っているか確認"""
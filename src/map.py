@@ -1,17 +1,85 @@
 """マップシステムの定義"""
 import pygame
+import queue
+import threading
+from collections import OrderedDict
 from constants import *
+from assets import asset_manager
 from npc import NPC
-from enemy import Enemy, Boss
+from enemy import Enemy, EnemyPool
+from spatial import SpatialGrid, ColliderRegistry, merge_rects
+from tilemap import TileMap
+from world import ChunkedWorld
+
+# maps/フォルダから読み込むマップ（タイルマップ形式）
+MAP_FILES = {
+    3: "maps/field.txt",  # 草原
+}
+
+# すべてのマップのID
+MAP_IDS = (0, 1, 2, 3)
+
+# マップ遷移（game.pyのGame.update）で行き来できる隣のマップ
+MAP_NEIGHBORS = {
+    0: (1, 3) if WORLD_MAP else (1,),  # 村 -> 森（北）、草原（東。WORLD_MAPのときだけ）
+    1: (0, 2),  # 森 -> 村（南）、ボスエリア（北）
+    2: (1,),    # ボスエリア -> 森（南）
+    3: (0,),    # 草原 -> 村（西）
+}
+
+def get_map_asset_keys(map_ids=MAP_IDS):
+    """マップID -> そのマップのNPCが読み込む画像の (パス, サイズ, 切り出す矩形) のリスト
+    
+    画面を使わずにマップを1つずつ作って調べるので、起動時に1回だけ呼んで使い回す
+    """
+    map_asset_keys = {}
+    for map_id in map_ids:
+        map_asset_keys[map_id] = [key for npc in Map(map_id, headless=True).npcs
+                                  for key in npc.get_asset_keys()]
+    return map_asset_keys
+
+def get_asset_keys(map_ids=MAP_IDS, map_asset_keys=None):
+    """マップのNPCが読み込む画像の (パス, サイズ, 切り出す矩形) のリスト（重複なし）
+    
+    map_asset_keys（get_map_asset_keys()の結果）を渡せば、マップを作らずにそこからまとめる
+    """
+    if map_asset_keys is None:
+        map_asset_keys = get_map_asset_keys(map_ids)
+    keys = []
+    for map_id in map_ids:
+        for key in map_asset_keys[map_id]:
+            if key not in keys:
+                keys.append(key)
+    return keys
 
 class Map:
-    def __init__(self, map_id):
+    def __init__(self, map_id, headless=False):
         self.map_id = map_id
+        self.headless = headless  # Trueなら画像の読み込みと描画の準備をしない
         self.tiles = []
-        self.obstacles = []
+        self.obstacles = []  # 描画用の障害物（1つずつ見た目を描く）
+        self.collision_rects = []  # 当たり判定用に隣接する障害物をまとめた矩形
         self.npcs = []
-        self.enemies = []
+        self.enemy_pool = EnemyPool()  # 敵のステータスの配列
+        self.enemies = self.enemy_pool.handles  # 1体ずつ扱うための窓口（出現順）
+        self.tilemap = None  # ファイルから読み込んだマップのタイル配列
+        self.world = None  # 画面より大きいマップのチャンク読み込み
+        self.width = MAP_WIDTH
+        self.height = MAP_HEIGHT
+        self.static_layer = None  # 地形・障害物の描画キャッシュ
+        self.obstacle_grid = None  # 障害物の当たり判定用グリッド
+        self.colliders = None  # NPC・敵の当たり判定
         self.create_map()
+        self.build_collision_grid()
+        if not headless:
+            self.load_assets()
+    
+    def load_assets(self):
+        """NPCの画像と地形の描画キャッシュを用意する"""
+        for npc in self.npcs:
+            npc.load_images()
+        if not self.world:
+            self.build_static_layer()
     
     def create_map(self):
         if self.map_id == 0:  # 村のマップ
@@ -78,24 +146,23 @@ class Map:
             ]
             
             # 敵（さまざまな種類を配置）
-            self.enemies = [
-                # スライム（森の入り口付近）
-                Enemy(600, 700, "スライム", "slime"),
-                Enemy(500, 650, "スライム", "slime"),
-                Enemy(700, 650, "スライム", "slime"),
-                
-                # ゴブリン（森の中央部）
-                Enemy(300, 400, "ゴブリン", "goblin"),
-                Enemy(900, 400, "ゴブリン", "goblin"),
-                Enemy(600, 450, "ゴブリン", "goblin"),
-                
-                # オーク（森の深部）
-                Enemy(200, 200, "オーク", "orc"),
-                Enemy(1000, 200, "オーク", "orc"),
-                
-                # ゴースト（レア敵）
-                Enemy(600, 100, "ゴースト", "ghost")
-            ]
+            spawn = self.enemy_pool.spawn
+            # スライム（森の入り口付近）
+            spawn("slime", 600, 700)
+            spawn("slime", 500, 650)
+            spawn("slime", 700, 650)
+            
+            # ゴブリン（森の中央部）
+            spawn("goblin", 300, 400)
+            spawn("goblin", 900, 400)
+            spawn("goblin", 600, 450)
+            
+            # オーク（森の深部）
+            spawn("orc", 200, 200)
+            spawn("orc", 1000, 200)
+            
+            # ゴースト（レア敵）
+            spawn("ghost", 600, 100)
             
         elif self.map_id == 2:  # ボスエリア（森の奥）
             # 地形タイルの作成
@@ -121,72 +188,210 @@ class Map:
             self.npcs = []
             
             # ボス
-            self.enemies = [
-                Boss(600, 400)  # 中央に配置
-            ]
+            self.enemy_pool.spawn("dark_knight", 600, 400)  # 中央に配置
+            
+        elif self.map_id in MAP_FILES:  # ファイルで定義されたマップ
+            self.load_tilemap(MAP_FILES[self.map_id])
     
-    def draw_tiles(self, screen, camera=None):
-        for tile in self.tiles:
-            if camera:
-                x, y = camera.apply(tile['x'], tile['y'])
-                # 画面内にある場合のみ描画
-                if x < SCREEN_WIDTH and y < SCREEN_HEIGHT and x + tile['w'] > 0 and y + tile['h'] > 0:
-                    pygame.draw.rect(screen, tile['color'], (x, y, tile['w'], tile['h']))
+    def load_tilemap(self, path):
+        """タイルマップを読み込んで地形・敵を設定"""
+        self.tilemap = TileMap.open(path)
+        self.width = self.tilemap.width
+        self.height = self.tilemap.height
+        if self.width > SCREEN_WIDTH or self.height > SCREEN_HEIGHT:
+            # 画面より大きいマップはカメラ周辺のチャンクだけを描画する
+            self.world = ChunkedWorld(self.tilemap)
+        for enemy_type, x, y in self.tilemap.spawns:
+            self.enemy_pool.spawn(enemy_type, x, y)
+    
+    def get_entity_state(self):
+        """キャッシュから外すときに残す状態（敵のHP）"""
+        return self.enemy_pool.hp[:self.enemy_pool.count].tolist()
+    
+    def restore_entity_state(self, state):
+        """作り直したマップに以前の状態を反映（倒した敵は復活しない）"""
+        for enemy, hp in zip(self.enemies, state):
+            if hp > 0:
+                enemy.hp = hp
             else:
-                pygame.draw.rect(screen, tile['color'], 
-                               (tile['x'], tile['y'], tile['w'], tile['h']))
+                enemy.defeat()
+    
+    def build_collision_grid(self):
+        """障害物とキャラクターをグリッドに登録（移動判定は近くのセルだけを調べる）"""
+        if self.tilemap:
+            # タイルマップは通行不可マスクの配列を直接引く
+            self.obstacle_grid = self.tilemap
+        else:
+            # 隣接する障害物をまとめてから登録（見た目はself.obstaclesのまま）
+            self.collision_rects = merge_rects(self.obstacles)
+            self.obstacle_grid = SpatialGrid()
+            for rect in self.collision_rects:
+                self.obstacle_grid.insert(rect)
+        # NPCと生きている敵は登録したまま、撃破・移動時だけ更新する
+        self.colliders = ColliderRegistry()
+        for npc in self.npcs:
+            self.colliders.add(npc)
+        for enemy in self.enemies:
+            if enemy.hp > 0:
+                self.colliders.add(enemy)
     
-    def draw_obstacles(self, screen, camera=None):
+    def visible_npcs(self, view):
+        """画面内（名前の表示分を含む）にいるNPC"""
+        return [entity for entity in self.colliders.query_items(view.inflate(VIEW_MARGIN * 2, VIEW_MARGIN * 2))
+                if isinstance(entity, NPC)]
+    
+    def visible_enemies(self, view):
+        """画面内（名前の表示分を含む）にいる生きている敵"""
+        return [entity for entity in self.colliders.query_items(view.inflate(VIEW_MARGIN * 2, VIEW_MARGIN * 2))
+                if isinstance(entity, Enemy)]
+    
+    def build_static_layer(self):
+        """地形と障害物を1枚のサーフェスに焼き込む（毎フレームの描画コマンドを削減）"""
+        layer = pygame.Surface((self.width, self.height))
+        layer.fill(BLACK)
+        if self.tilemap:
+            self.tilemap.draw(layer)
+        for tile in self.tiles:
+            pygame.draw.rect(layer, tile['color'],
+                             (tile['x'], tile['y'], tile['w'], tile['h']))
         for obstacle in self.obstacles:
-            if camera:
-                obs_x, obs_y, obs_w, obs_h = camera.apply_rect(obstacle)
-                # 画面内にある場合のみ描画
-                if obs_x < SCREEN_WIDTH and obs_y < SCREEN_HEIGHT and obs_x + obs_w > 0 and obs_y + obs_h > 0:
-                    obs_rect = pygame.Rect(obs_x, obs_y, obs_w, obs_h)
-                    if self.map_id == 0:  # 村
-                        if obstacle.width > 100:  # 家
-                            pygame.draw.rect(screen, BROWN, obs_rect)
-                            # 屋根
-                            pygame.draw.polygon(screen, DARK_RED, [
-                                (obs_x - 10, obs_y),
-                                (obs_x + obs_w // 2, obs_y - 30),
-                                (obs_x + obs_w + 10, obs_y)
-                            ])
-                        else:  # 木
-                            # 幹
-                            pygame.draw.rect(screen, BROWN, obs_rect)
-                            # 葉
-                            pygame.draw.circle(screen, GREEN, 
-                                             (obs_x + obs_w // 2, obs_y - 10), 30)
-                    else:  # 森
-                        # 木の幹
-                        pygame.draw.rect(screen, BROWN, obs_rect)
-                        # 葉（大きめ）
-                        pygame.draw.circle(screen, DARK_GREEN, 
-                                         (obs_x + obs_w // 2, obs_y), 40)
-                        pygame.draw.circle(screen, GREEN, 
-                                         (obs_x + obs_w // 2, obs_y - 20), 35)
-            else:
-                if self.map_id == 0:  # 村
-                    if obstacle.width > 100:  # 家
-                        pygame.draw.rect(screen, BROWN, obstacle)
-                        # 屋根
-                        pygame.draw.polygon(screen, DARK_RED, [
-                            (obstacle.x - 10, obstacle.y),
-                            (obstacle.x + obstacle.width // 2, obstacle.y - 30),
-                            (obstacle.x + obstacle.width + 10, obstacle.y)
-                        ])
-                    else:  # 木
-                        # 幹
-                        pygame.draw.rect(screen, BROWN, obstacle)
-                        # 葉
-                        pygame.draw.circle(screen, GREEN, 
-                                         (obstacle.x + obstacle.width // 2, obstacle.y - 10), 30)
-                else:  # 森
-                    # 木の幹
-                    pygame.draw.rect(screen, BROWN, obstacle)
-                    # 葉（大きめ）
-                    pygame.draw.circle(screen, DARK_GREEN, 
-                                     (obstacle.x + obstacle.width // 2, obstacle.y), 40)
-                    pygame.draw.circle(screen, GREEN, 
-                                     (obstacle.x + obstacle.width // 2, obstacle.y - 20), 35)
\ No newline at end of file
+            self.draw_obstacle(layer, obstacle)
+        # 画面と同じピクセルフォーマットに変換して転送を高速化
+        if pygame.display.get_surface():
+            layer = layer.convert()
+        self.static_layer = layer
+    
+    def invalidate_static_layer(self):
+        """地形や障害物を変更したときに呼ぶ（次の描画で再生成）"""
+        self.static_layer = None
+    
+    def get_static_layer(self):
+        """キャッシュ済みの地形・障害物レイヤーを取得"""
+        if self.static_layer is None:
+            self.build_static_layer()
+        return self.static_layer
+    
+    def draw_obstacle(self, screen, obstacle):
+        """障害物1つを指定位置に描画"""
+        if self.map_id == 0:  # 村
+            if obstacle.width > 100:  # 家
+                pygame.draw.rect(screen, BROWN, obstacle)
+                # 屋根
+                pygame.draw.polygon(screen, DARK_RED, [
+                    (obstacle.x - 10, obstacle.y),
+                    (obstacle.x + obstacle.width // 2, obstacle.y - 30),
+                    (obstacle.x + obstacle.width + 10, obstacle.y)
+                ])
+            else:  # 木
+                # 幹
+                pygame.draw.rect(screen, BROWN, obstacle)
+                # 葉
+                pygame.draw.circle(screen, GREEN, 
+                                 (obstacle.x + obstacle.width // 2, obstacle.y - 10), 30)
+        else:  # 森
+            # 木の幹
+            pygame.draw.rect(screen, BROWN, obstacle)
+            # 葉（大きめ）
+            pygame.draw.circle(screen, DARK_GREEN, 
+                             (obstacle.x + obstacle.width // 2, obstacle.y), 40)
+            pygame.draw.circle(screen, GREEN, 
+                             (obstacle.x + obstacle.width // 2, obstacle.y - 20), 35)
+
+
+class AssetPrefetcher:
+    """隣のマップのNPCの画像をバックグラウンドのスレッドでデコードしておく
+    
+    画像のデコードと拡大縮小の間はGILが外れるので、その間もゲームは進む。画面の形式への
+    変換とキャッシュへの登録は、メインスレッドのasset_manager.update()が行う
+    """
+    def __init__(self, asset_keys, assets=asset_manager):
+        self.assets = assets
+        self.asset_keys = asset_keys  # マップID -> 読み込む画像のキー（メインスレッドで先に調べておく）
+        self.requests = queue.Queue()  # 先読みするマップID（Noneで終了）
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="AssetPrefetcher", daemon=True)
+        self.thread.start()
+    
+    def prefetch_neighbors(self, map_id):
+        """map_idから行ける隣のマップの画像の先読みを頼む"""
+        for neighbor_id in MAP_NEIGHBORS.get(map_id, ()):
+            self.requests.put(neighbor_id)
+    
+    def run(self):
+        while not self.stopping.is_set():
+            map_id = self.requests.get()
+            if map_id is None:
+                break
+            for key in self.asset_keys.get(map_id, ()):
+                if self.stopping.is_set():
+                    break
+                self.assets.prefetch(*key)
+    
+    def stop(self):
+        """残りの先読みを捨ててスレッドを止める（デコード中の1枚は終わるのを待つ）"""
+        self.stopping.set()
+        while True:
+            try:
+                self.requests.get_nowait()
+            except queue.Empty:
+                break
+        self.requests.put(None)
+        self.thread.join()
+
+
+class MapManager:
+    """最近訪れたマップをLRUで保持し、再訪時はそのまま再利用する"""
+    def __init__(self, capacity=MAP_CACHE_SIZE, headless=False, map_asset_keys=None, prefetch=MAP_PREFETCH):
+        self.capacity = capacity
+        self.headless = headless  # 画面を使わずに処理だけ動かすか
+        self.maps = OrderedDict()  # map_id -> Map（末尾ほど最近使った）
+        self.saved_states = {}  # キャッシュから外れたマップの敵の状態
+        # 画像を読み込まないヘッドレスでは先読みもしない
+        self.prefetcher = None
+        if prefetch and not headless:
+            # 読み込む画像はマップを作らないとわからないので、スレッドではなくここで1回だけ調べる
+            if map_asset_keys is None:
+                map_asset_keys = get_map_asset_keys()
+            self.prefetcher = AssetPrefetcher(map_asset_keys)
+    
+    def get(self, map_id):
+        """マップを取得（キャッシュになければ作成）"""
+        if map_id in self.maps:
+            self.maps.move_to_end(map_id)
+            self.prefetch_neighbors(map_id)
+            return self.maps[map_id]
+        
+        game_map = Map(map_id, self.headless)
+        if map_id in self.saved_states:
+            game_map.restore_entity_state(self.saved_states.pop(map_id))
+        self.maps[map_id] = game_map
+        
+        # 容量を超えたら一番古いマップを状態だけ残して破棄
+        while len(self.maps) > self.capacity:
+            old_id, old_map = self.maps.popitem(last=False)
+            self.saved_states[old_id] = old_map.get_entity_state()
+        self.prefetch_neighbors(map_id)
+        return game_map
+    
+    def prefetch_neighbors(self, map_id):
+        """隣のマップの画像を先読みさせる（今のマップを作り終えてから頼む）"""
+        if self.prefetcher:
+            self.prefetcher.prefetch_neighbors(map_id)
+    
+    def close(self):
+        """先読みのスレッドを止める"""
+        if self.prefetcher:
+            self.prefetcher.stop()
+            self.prefetcher = None
+    
+    def get_state(self):
+        """全マップの敵の状態（キャッシュ中のものと外したもの）"""
+        states = dict(self.saved_states)
+        for map_id, game_map in self.maps.items():
+            states[map_id] = game_map.get_entity_state()
+        return states
+    
+    def restore_state(self, states):
+        """get_state()で保存した状態に戻す（マップは次のget()で作り直す）"""
+        self.maps.clear()
+        self.saved_states = {int(map_id): state for map_id, state in states.items()}
@@ -0,0 +1,70 @@
+"""マップコンパイラ（テキストのマップを読み込み用のバイナリ形式に変換）
+
+使い方:
+    python src/map_compiler.py maps/field.txt [maps/other.txt ...]
+
+maps/field.txt から maps/field.rpgmap を作る。ゲームは新しい .rpgmap が
+あればそれをmmapで開き、タイル配列・通行不可マスク・ナビゲーショングリッド・
+敵の出現表・描画済み背景をそのまま使う。
+"""
+import json
+import sys
+import pygame
+from constants import *
+from tilemap import (TileMap, BUNDLE_MAGIC, BUNDLE_VERSION, BUNDLE_SECTIONS,
+                     BUNDLE_HEADER, BUNDLE_DEFINITIONS_HASH, bundle_path_for)
+
+SECTION_ALIGN = 4096  # 各セクションをページ境界に揃える（必要な部分だけ読まれる）
+
+
+def align(offset):
+    return (offset + SECTION_ALIGN - 1) // SECTION_ALIGN * SECTION_ALIGN
+
+
+def compile_map(source_path, bundle_path=None):
+    """マップファイルをコンパイルして出力先のパスを返す"""
+    bundle_path = bundle_path or bundle_path_for(source_path)
+    tilemap = TileMap.load(source_path)
+    
+    # 背景をあらかじめ描画しておく
+    background = pygame.Surface((tilemap.width, tilemap.height))
+    tilemap.draw(background)
+    
+    meta = {"name": tilemap.name, "spawns": tilemap.spawns}
+    payloads = {
+        "tiles": tilemap.tiles.tobytes(),
+        "blocked": tilemap.blocked.tobytes(),
+        "meta": json.dumps(meta, ensure_ascii=False).encode("utf-8"),
+        "background": pygame.image.tobytes(background, "RGB"),
+    }
+    
+    # セクションの配置を決める
+    layout = []
+    offset = align(BUNDLE_HEADER.size)
+    for name in BUNDLE_SECTIONS:
+        layout.append((offset, len(payloads[name])))
+        offset = align(offset + len(payloads[name]))
+    
+    header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, TILE_SIZE,
+                                tilemap.cols, tilemap.rows, BUNDLE_DEFINITIONS_HASH,
+                                *[value for section in layout for value in section])
+    with open(bundle_path, "wb") as f:
+        f.write(header)
+        for name, (section_offset, _) in zip(BUNDLE_SECTIONS, layout):
+            f.seek(section_offset)
+            f.write(payloads[name])
+    return bundle_path
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    for source_path in sys.argv[1:]:
+        bundle_path = compile_map(source_path)
+        print(f"コンパイルしました: {source_path} -> {bundle_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,16 @@
 import pygame
 import math
 from constants import *
-from sprite_utils import load_sprite_sheet, get_animation_frames
+from text_cache import render_text
+from assets import load_image
+from sprite_utils import load_sprite_sheet, get_animation_frames, DIRECTION_ROWS
 
 class NPC:
+    __slots__ = ("x", "y", "size", "name", "dialogue", "is_talking",
+                 "portrait_path", "portrait", "sprite_path", "sprite", "sprite_sheet",
+                 "current_frame", "animation_frames", "is_sprite_sheet",
+                 "frame_width", "frame_height", "colliders")
+    
     def __init__(self, x, y, name, dialogue, portrait_path=None, sprite_path=None, 
                  is_sprite_sheet=False, frame_width=32, frame_height=32):
         self.x = x
@@ -21,38 +28,57 @@ class NPC:
         self.current_frame = 0
         self.animation_frames = []
         self.is_sprite_sheet = is_sprite_sheet
-        
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.colliders = None  # 登録先の当たり判定（マップが設定）
+    
+    def get_asset_keys(self):
+        """load_images()で読み込む画像の (パス, サイズ, 切り出す矩形) のリスト"""
+        keys = []
+        if self.portrait_path:
+            keys.append((self.portrait_path, PORTRAIT_SIZE, None))
+        if self.sprite_path:
+            if self.is_sprite_sheet:
+                # シート全体（元の大きさ）と、ゲームサイズにした下向きの最初のフレーム
+                keys.append((self.sprite_path, None, None))
+                keys.append((self.sprite_path, (self.size, self.size),
+                             (0, DIRECTION_ROWS["down"] * self.frame_height, self.frame_width, self.frame_height)))
+            else:
+                keys.append((self.sprite_path, (self.size, self.size), None))
+        return keys
+    
+    def load_images(self):
+        """ポートレートとスプライトを読み込む（ヘッドレスでは呼ばない）"""
         # ポートレート画像を読み込む
-        if portrait_path:
+        if self.portrait_path:
             try:
-                self.portrait = pygame.image.load(portrait_path)
-                # 画像サイズを調整（会話ウィンドウ用）
-                self.portrait = pygame.transform.scale(self.portrait, (150, 150))
-                print(f"ポートレートを読み込みました: {portrait_path}")
+                # 会話ウィンドウ用の大きさで読み込む（同じ画像は共有される）
+                self.portrait = load_image(self.portrait_path, PORTRAIT_SIZE)
+                print(f"ポートレートを読み込みました: {self.portrait_path}")
             except Exception as e:
-                print(f"ポートレートを読み込めませんでした: {portrait_path}")
+                print(f"ポートレートを読み込めませんでした: {self.portrait_path}")
                 print(f"エラー: {e}")
         
         # スプライト画像を読み込む
-        if sprite_path:
+        if self.sprite_path:
             try:
-                if is_sprite_sheet:
+                if self.is_sprite_sheet:
                     # スプライトシートとして読み込み（元サイズで）
-                    self.sprite_sheet = load_sprite_sheet(sprite_path, frame_width, frame_height, 1.0)
+                    self.sprite_sheet = load_sprite_sheet(self.sprite_path, self.frame_width, self.frame_height, 1.0)
                     if self.sprite_sheet:
                         self.animation_frames = get_animation_frames(self.sprite_sheet, "down")
                         if self.animation_frames:
-                            # フレームをゲームサイズに調整
-                            self.sprite = pygame.transform.scale(self.animation_frames[0], (self.size, self.size))
-                        print(f"スプライトシートを読み込みました: {sprite_path}")
+                            # フレームをゲームサイズに調整（縮小済みの画像はディスクキャッシュから読む）
+                            self.sprite = load_image(self.sprite_path, (self.size, self.size),
+                                                     self.sprite_sheet.get_frame_rect("down", 0))
+                        print(f"スプライトシートを読み込みました: {self.sprite_path}")
                 else:
                     # 単一画像として読み込み
-                    self.sprite = pygame.image.load(sprite_path)
-                    # スプライトサイズを調整
-                    self.sprite = pygame.transform.scale(self.sprite, (self.size, self.size))
-                    print(f"スプライトを読み込みました: {sprite_path}")
+                    # スプライトの大きさで読み込む
+                    self.sprite = load_image(self.sprite_path, (self.size, self.size))
+                    print(f"スプライトを読み込みました: {self.sprite_path}")
             except Exception as e:
-                print(f"スプライトを読み込めませんでした: {sprite_path}")
+                print(f"スプライトを読み込めませんでした: {self.sprite_path}")
                 print(f"エラー: {e}")
         
     def draw(self, screen, font):
@@ -61,14 +87,15 @@ class NPC:
             # 画像を中央に配置
             sprite_rect = self.sprite.get_rect()
             sprite_rect.center = (self.x + self.size // 2, self.y + self.size // 2)
-            screen.blit(self.sprite, sprite_rect)
+            body_rect = screen.blit(self.sprite, sprite_rect)
         else:
-            pygame.draw.rect(screen, BLUE, (self.x, self.y, self.size, self.size))
+            body_rect = pygame.draw.rect(screen, BLUE, (self.x, self.y, self.size, self.size))
         
         # Draw name above NPC
-        name_text = font.render(self.name, True, WHITE)
+        name_text = render_text(font, self.name, WHITE)
         name_rect = name_text.get_rect(center=(self.x + self.size // 2, self.y - 10))
-        screen.blit(name_text, name_rect)
+        # 描画した領域を返す（差分描画用）
+        return body_rect.union(screen.blit(name_text, name_rect))
     
     def draw_at_position(self, screen, font, x, y):
         # スプライト画像があれば描画、なければ青い四角
@@ -76,14 +103,14 @@ class NPC:
             # 画像を中央に配置
             sprite_rect = self.sprite.get_rect()
             sprite_rect.center = (x + self.size // 2, y + self.size // 2)
-            screen.blit(self.sprite, sprite_rect)
+            body_rect = screen.blit(self.sprite, sprite_rect)
         else:
-            pygame.draw.rect(screen, BLUE, (x, y, self.size, self.size))
+            body_rect = pygame.draw.rect(screen, BLUE, (x, y, self.size, self.size))
         
         # Draw name above NPC
-        name_text = font.render(self.name, True, WHITE)
+        name_text = render_text(font, self.name, WHITE)
         name_rect = name_text.get_rect(center=(x + self.size // 2, y - 10))
-        screen.blit(name_text, name_rect)
+        return body_rect.union(screen.blit(name_text, name_rect))
     
     def get_center(self):
         return (self.x + self.size // 2, self.y + self.size // 2)
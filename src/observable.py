@@ -0,0 +1,20 @@
+"""値の変更通知の定義"""
+
+class Observable:
+    """値が変わったことを登録されたリスナー（HUDなど）に知らせる
+    
+    継承したクラスは__init__で self.listeners = [] を用意すること。
+    （__slots__を使うクラスは "listeners" を__slots__に含める）
+    """
+    __slots__ = ()
+    
+    def add_listener(self, listener):
+        """変更時に引数なしで呼ばれる関数を登録"""
+        self.listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+    
+    def notify_changed(self):
+        for listener in self.listeners:
+            listener()
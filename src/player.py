@@ -3,13 +3,23 @@ import pygame
 from constants import *
 from item import Inventory
 from skill import SkillSystem
+from observable import Observable
 
-class Player:
+class Player(Observable):
+    # 大量に作っても軽いように__dict__を持たせない（属性はここに並べたものだけ）
+    __slots__ = ("x", "y", "prev_x", "prev_y", "size", "base_speed", "map_width", "map_height",
+                 "hp", "max_hp", "attack", "defense", "level", "exp", "exp_to_next_level",
+                 "vel_x", "vel_y", "acceleration", "inventory", "skills", "listeners")
+    
     def __init__(self, x, y):
         self.x = float(x)  # float型で精密な位置計算
         self.y = float(y)
+        self.prev_x = self.x  # 前のティックの位置（描画の補間用）
+        self.prev_y = self.y
         self.size = PLAYER_SIZE
         self.base_speed = PLAYER_SPEED_VILLAGE  # デフォルトは村の速度
+        self.map_width = MAP_WIDTH  # 移動できる範囲（現在のマップの大きさ）
+        self.map_height = MAP_HEIGHT
         self.hp = 100
         self.max_hp = 100
         self.attack = 20
@@ -25,8 +35,41 @@ class Player:
         self.inventory = Inventory()
         # スキルシステム
         self.skills = SkillSystem()
+        # ステータスの変更を知らせる先（HUDなど）
+        self.listeners = []
         
-    def move(self, keys, obstacles):
+    # リプレイのキーフレームに保存する属性
+    STATE_ATTRS = ("x", "y", "prev_x", "prev_y", "vel_x", "vel_y", "base_speed",
+                   "map_width", "map_height", "hp", "max_hp", "attack", "defense",
+                   "level", "exp", "exp_to_next_level")
+    
+    def get_state(self):
+        """ステータス・位置・持ち物をまとめた状態"""
+        state = {name: getattr(self, name) for name in self.STATE_ATTRS}
+        state["inventory"] = self.inventory.get_state()
+        state["skills"] = self.skills.get_state()
+        return state
+    
+    def restore_state(self, state):
+        """get_state()で保存した状態に戻す"""
+        for name in self.STATE_ATTRS:
+            setattr(self, name, state[name])
+        self.inventory.restore_state(state["inventory"])
+        self.skills.restore_state(state["skills"])
+        self.notify_changed()
+    
+    def save_position(self):
+        """ティックの始めに現在位置を前の位置として覚える"""
+        self.prev_x = self.x
+        self.prev_y = self.y
+    
+    def get_render_position(self, alpha):
+        """前のティックと現在の位置の間を補間した描画用の位置（alpha: 0.0〜1.0）"""
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
+    
+    def move(self, keys, obstacles=(), obstacle_grid=None, colliders=None):
+        """キー入力で移動（obstacles: 矩形のリスト、obstacle_grid: 静的障害物のグリッド、colliders: キャラクターの当たり判定）"""
         old_x = self.x
         old_y = self.y
         
@@ -50,36 +93,41 @@ class Player:
         # X軸方向の移動を先に処理
         self.x += self.vel_x
         player_rect = pygame.Rect(int(self.x), int(self.y), self.size, self.size)
-        for obstacle in obstacles:
-            if player_rect.colliderect(obstacle):
-                self.x = old_x
-                self.vel_x = 0  # 衝突時は速度をリセット
-                break
+        if self.is_blocked(player_rect, obstacles, obstacle_grid, colliders):
+            self.x = old_x
+            self.vel_x = 0  # 衝突時は速度をリセット
         
         # Y軸方向の移動を処理
         self.y += self.vel_y
         player_rect = pygame.Rect(int(self.x), int(self.y), self.size, self.size)
-        for obstacle in obstacles:
-            if player_rect.colliderect(obstacle):
-                self.y = old_y
-                self.vel_y = 0  # 衝突時は速度をリセット
-                break
+        if self.is_blocked(player_rect, obstacles, obstacle_grid, colliders):
+            self.y = old_y
+            self.vel_y = 0  # 衝突時は速度をリセット
         
-        # Keep player within screen bounds
-        self.x = max(0, min(self.x, SCREEN_WIDTH - self.size))
-        self.y = max(0, min(self.y, SCREEN_HEIGHT - self.size))
+        # Keep player within map bounds
+        self.x = max(0, min(self.x, self.map_width - self.size))
+        self.y = max(0, min(self.y, self.map_height - self.size))
+    
+    def is_blocked(self, rect, obstacles=(), obstacle_grid=None, colliders=None):
+        """移動先の矩形が障害物と重なるか（グリッドは移動先が触れるセルだけを調べる）"""
+        if obstacle_grid is not None and obstacle_grid.collides(rect):
+            return True
+        if colliders is not None and colliders.collides(rect):
+            return True
+        return rect.collidelist(obstacles) != -1
     
     def draw(self, screen):
-        pygame.draw.rect(screen, RED, (int(self.x), int(self.y), self.size, self.size))
+        return pygame.draw.rect(screen, RED, (int(self.x), int(self.y), self.size, self.size))
     
     def draw_at_position(self, screen, x, y):
-        pygame.draw.rect(screen, RED, (int(x), int(y), self.size, self.size))
+        return pygame.draw.rect(screen, RED, (int(x), int(y), self.size, self.size))
     
     def get_center(self):
         return (self.x + self.size // 2, self.y + self.size // 2)
     
     def take_damage(self, damage):
         self.hp = max(0, self.hp - damage)
+        self.notify_changed()
         return self.hp > 0  # Returns True if still alive
     
     def get_total_attack(self):
@@ -92,6 +140,11 @@ class Player:
         base_defense = self.defense + self.skills.get_defense_bonus()
         return base_defense + self.inventory.buffs.get("defense_boost", 0)
     
+    def set_map_bounds(self, width, height):
+        """移動できる範囲をマップの大きさに合わせる"""
+        self.map_width = width
+        self.map_height = height
+    
     def set_speed_for_map(self, map_id):
         """マップに応じて移動速度を設定"""
         if map_id == 0:  # 村
@@ -100,6 +153,8 @@ class Player:
             self.base_speed = PLAYER_SPEED_FIELD
         elif map_id == 2:  # ボスエリア
             self.base_speed = PLAYER_SPEED_BOSS
+        elif map_id == 3:  # 草原
+            self.base_speed = PLAYER_SPEED_FIELD
         else:
             self.base_speed = PLAYER_SPEED_VILLAGE
             
@@ -120,7 +175,8 @@ class Player:
             self.level_up()
             messages.append(f"レベル{self.level}に上がった！")
             messages.append(f"スキルポイントを１獲得！ (SP: {self.skills.skill_points})")
-            
+        
+        self.notify_changed()
         return messages
         
     def level_up(self):
@@ -134,4 +190,5 @@ class Player:
         self.defense += 2
         self.exp_to_next_level = self.level * 100  # 次のレベルに必要な経験値
         # スキルポイントを付与
-        self.skills.add_skill_point(1)
\ No newline at end of file
+        self.skills.add_skill_point(1)
+        self.notify_changed()
\ No newline at end of file
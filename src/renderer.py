@@ -0,0 +1,104 @@
+"""画面更新（フリップ／差分矩形）の定義"""
+import pygame
+
+
+class FullScreenRenderer:
+    """毎フレーム背景を全面に描き、画面全体をフリップする"""
+    def __init__(self, screen):
+        self.screen = screen
+    
+    def begin_frame(self, background):
+        """背景を描く（Noneなら呼び出し側が背景を描画済み）"""
+        if background is not None:
+            self.screen.blit(background, (0, 0))
+    
+    def add(self, rect):
+        """全面更新なので変更領域の記録は不要"""
+        pass
+    
+    def end_frame(self):
+        pygame.display.flip()
+
+
+class DirtyRectRenderer:
+    """変更のあった矩形だけを背景から復元し、その部分だけ画面に送る"""
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = None
+        self.dirty_rects = []  # 今フレームで描画した領域
+        self.last_rects = []   # 前フレームで描画した領域（次フレームで消す）
+        self.full_redraw = True
+    
+    def begin_frame(self, background):
+        """背景を描く（Noneなら呼び出し側が画面全体を描画済みなので全面を更新）"""
+        if background is None:
+            self.background = None
+            self.full_redraw = True
+            return
+        if background is not self.background:
+            # マップが変わったら全面を描き直す
+            self.background = background
+            self.full_redraw = True
+        
+        if self.full_redraw:
+            self.screen.blit(background, (0, 0))
+        else:
+            # 前フレームのスプライトを背景で上書きして消す
+            for rect in self.last_rects:
+                self.screen.blit(background, rect, rect)
+    
+    def add(self, rect):
+        """描画した領域を記録（描画されなかった場合はNone）"""
+        if rect:
+            self.dirty_rects.append(rect)
+    
+    def end_frame(self):
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.last_rects + self.dirty_rects)
+        self.last_rects = self.dirty_rects
+        self.dirty_rects = []
+
+
+class ScrollingBackground:
+    """前フレームの背景をSurface.scrollでずらし、新しく見えた帯だけを描き足す"""
+    def __init__(self, size):
+        self.surface = pygame.Surface(size)
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert()
+        self.world = None  # 前フレームで描いたワールド
+        self.origin = None  # 前フレームのカメラ位置（整数）
+    
+    def draw(self, screen, world, view):
+        """viewの範囲の背景を画面に描く（worldはdraw_areaを持つChunkedWorld）"""
+        width, height = self.surface.get_size()
+        x, y = view.topleft
+        if self.world is not world or self.origin is None:
+            dx = dy = None
+        else:
+            dx = x - self.origin[0]
+            dy = y - self.origin[1]
+        
+        if dx is None or abs(dx) >= width or abs(dy) >= height:
+            # マップが変わったか大きく動いたときは全体を描き直す
+            world.draw_area(self.surface, pygame.Rect(x, y, width, height))
+        elif dx or dy:
+            self.surface.scroll(-dx, -dy)
+            # 新しく見えた縦・横の帯だけを描く
+            strips = []
+            if dx > 0:
+                strips.append(pygame.Rect(width - dx, 0, dx, height))
+            elif dx < 0:
+                strips.append(pygame.Rect(0, 0, -dx, height))
+            if dy > 0:
+                strips.append(pygame.Rect(0, height - dy, width, dy))
+            elif dy < 0:
+                strips.append(pygame.Rect(0, 0, width, -dy))
+            for strip in strips:
+                world.draw_area(self.surface, strip.move(x, y), strip.topleft)
+        
+        self.world = world
+        self.origin = (x, y)
+        screen.blit(self.surface, (0, 0))
@@ -0,0 +1,205 @@
+"""入力の記録とリプレイ（同じ乱数の種と入力でゲームを再現する）
+
+使い方:
+    python src/replay.py replays/replay_20240101_120000.rpgreplay
+    python src/replay.py replays/replay_20240101_120000.rpgreplay --seek 6000
+
+ファイル形式:
+    ヘッダー: 識別子, バージョン, ティックレート, 乱数の種, ティック数, キーフレーム数
+    入力: 圧縮した長さ(4バイト) + zlib圧縮した1ティック2バイトの入力
+    キーフレーム × キーフレーム数: ティック, 圧縮した長さ + zlib圧縮したJSON（Game.snapshot()）
+"""
+import array
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+import pygame
+from constants import *
+from game import Game
+from headless import KeyState, init_headless
+
+# 1ティックの入力を16ビットにまとめる
+# 下位4ビット: 押されているキー、その上の6ビット: そのティックで押されたキー
+HELD_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+PRESSED_KEYS = (pygame.K_SPACE, pygame.K_h, pygame.K_p, pygame.K_d, pygame.K_s, pygame.K_ESCAPE)
+
+REPLAY_MAGIC = b"RPGR"
+REPLAY_VERSION = 1
+REPLAY_EXTENSION = ".rpgreplay"
+REPLAY_HEADER = struct.Struct("<4sHHQII")
+SECTION_LENGTH = struct.Struct("<I")
+KEYFRAME_HEADER = struct.Struct("<II")  # ティック, 圧縮した長さ
+
+
+def encode_input(keys, pressed_keys):
+    """押されているキーと押されたキーを16ビットの値にする"""
+    mask = 0
+    for bit, key in enumerate(HELD_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    for bit, key in enumerate(PRESSED_KEYS, len(HELD_KEYS)):
+        if key in pressed_keys:
+            mask |= 1 << bit
+    return mask
+
+
+def decode_input(mask):
+    """encode_input()の値を (押されているキー, 押されたキーのリスト) に戻す"""
+    held = [key for bit, key in enumerate(HELD_KEYS) if mask & (1 << bit)]
+    pressed = [key for bit, key in enumerate(PRESSED_KEYS, len(HELD_KEYS)) if mask & (1 << bit)]
+    return KeyState(held), pressed
+
+
+def normalize_state(state):
+    """比較用にJSONと同じ形（タプルはリスト、キーは文字列）にそろえる"""
+    return json.loads(json.dumps(state))
+
+
+class Replay:
+    """乱数の種、ティックごとの入力、途中から再生するためのキーフレーム"""
+    def __init__(self, seed, inputs=(), keyframes=None, tick_rate=TICK_RATE):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.inputs = array.array("H", inputs)
+        self.keyframes = keyframes or {}  # ティック -> Game.snapshot()
+    
+    def save(self, path):
+        """ファイルに書き出す"""
+        inputs = zlib.compress(self.inputs.tobytes())
+        with open(path, "wb") as f:
+            f.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.tick_rate, self.seed,
+                                       len(self.inputs), len(self.keyframes)))
+            f.write(SECTION_LENGTH.pack(len(inputs)))
+            f.write(inputs)
+            for tick in sorted(self.keyframes):
+                data = zlib.compress(json.dumps(self.keyframes[tick]).encode("utf-8"))
+                f.write(KEYFRAME_HEADER.pack(tick, len(data)))
+                f.write(data)
+    
+    @classmethod
+    def load(cls, path):
+        """save()で書き出したファイルを読み込む"""
+        with open(path, "rb") as f:
+            data = f.read()
+        
+        magic, version, tick_rate, seed, tick_count, keyframe_count = REPLAY_HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path}: 対応していないリプレイ形式です")
+        if tick_rate != TICK_RATE:
+            raise ValueError(f"{path}: ティックレートが違います（{tick_rate}、現在は{TICK_RATE}）")
+        offset = REPLAY_HEADER.size
+        
+        length, = SECTION_LENGTH.unpack_from(data, offset)
+        offset += SECTION_LENGTH.size
+        inputs = array.array("H")
+        inputs.frombytes(zlib.decompress(data[offset:offset + length]))
+        offset += length
+        
+        keyframes = {}
+        for _ in range(keyframe_count):
+            tick, length = KEYFRAME_HEADER.unpack_from(data, offset)
+            offset += KEYFRAME_HEADER.size
+            keyframes[tick] = json.loads(zlib.decompress(data[offset:offset + length]))
+            offset += length
+        
+        if len(inputs) != tick_count:
+            raise ValueError(f"{path}: 入力のティック数が合いません")
+        return cls(seed, inputs, keyframes, tick_rate)
+
+
+class ReplayRecorder:
+    """ゲームの入力をティックごとに記録する"""
+    def __init__(self, game, keyframe_interval=REPLAY_KEYFRAME_INTERVAL):
+        self.game = game
+        self.keyframe_interval = keyframe_interval
+        self.replay = Replay(game.seed)
+        self.replay.keyframes[game.tick_count] = normalize_state(game.snapshot())
+    
+    def update(self, keys, pressed_keys):
+        """入力を記録してゲームを1ティック進める
+        
+        記録した値から戻した入力で進めるので、リプレイと必ず同じ入力になる
+        """
+        mask = encode_input(keys, pressed_keys)
+        self.replay.inputs.append(mask)
+        self.game.update(*decode_input(mask))
+        if self.game.tick_count % self.keyframe_interval == 0:
+            self.replay.keyframes[self.game.tick_count] = normalize_state(self.game.snapshot())
+    
+    def save(self, directory=REPLAY_DIR):
+        """最後の状態をキーフレームに加えて書き出し、ファイルのパスを返す"""
+        self.replay.keyframes[self.game.tick_count] = normalize_state(self.game.snapshot())
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, time.strftime("replay_%Y%m%d_%H%M%S") + REPLAY_EXTENSION)
+        self.replay.save(path)
+        return path
+
+
+class ReplayPlayer:
+    """記録した入力で画面なしにゲームを再生し、キーフレームと食い違わないか確かめる"""
+    def __init__(self, replay):
+        init_headless()
+        self.replay = replay
+        self.game = Game(headless=True, seed=replay.seed)
+        self.desyncs = []  # キーフレームと状態が違ったティック
+        if 0 in replay.keyframes:
+            # 記録開始時の状態から始める
+            self.game.restore(replay.keyframes[0])
+    
+    def step(self, ticks=1):
+        """指定ティック数だけ再生する（記録の終わりで止まる）"""
+        game = self.game
+        inputs = self.replay.inputs
+        for _ in range(ticks):
+            if game.tick_count >= len(inputs):
+                break
+            game.update(*decode_input(inputs[game.tick_count]))
+            keyframe = self.replay.keyframes.get(game.tick_count)
+            if keyframe is not None and normalize_state(game.snapshot()) != keyframe:
+                self.desyncs.append(game.tick_count)
+    
+    def seek(self, tick):
+        """直前のキーフレームから状態を戻し、指定ティックまで再生する"""
+        start = max((t for t in self.replay.keyframes if t <= tick), default=None)
+        if start is None:
+            self.game = Game(headless=True, seed=self.replay.seed)
+        elif start > self.game.tick_count or tick < self.game.tick_count:
+            self.game.restore(self.replay.keyframes[start])
+        self.step(tick - self.game.tick_count)
+    
+    def run(self):
+        """最後まで再生して、キーフレームとすべて一致したかを返す"""
+        self.step(len(self.replay.inputs) - self.game.tick_count)
+        return not self.desyncs
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("使い方: python src/replay.py リプレイファイル [--seek ティック]")
+        return 2
+    replay = Replay.load(sys.argv[1])
+    player = ReplayPlayer(replay)
+    
+    start = time.perf_counter()
+    if "--seek" in sys.argv:
+        player.seek(int(sys.argv[sys.argv.index("--seek") + 1]))
+    ok = player.run()
+    elapsed = time.perf_counter() - start
+    
+    game = player.game
+    print(f"{len(replay.inputs)}ティック（{len(replay.inputs) / TICK_RATE:.0f}秒分）を{elapsed:.2f}秒で再生"
+          f"（実時間の{len(replay.inputs) / TICK_RATE / max(elapsed, 1e-6):.0f}倍）")
+    print(f"マップ: {game.current_map_id}  位置: ({game.player.x:.1f}, {game.player.y:.1f})  "
+          f"HP: {game.player.hp}/{game.player.max_hp}  Lv.{game.player.level}")
+    if ok:
+        print(f"キーフレーム{len(replay.keyframes)}個とすべて一致しました")
+        return 0
+    print(f"キーフレームと食い違いました: ティック {player.desyncs}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 """スキルシステム"""
+from observable import Observable
 
 class Skill:
+    __slots__ = ("name", "description", "level", "max_level")
+    
     def __init__(self, name, description, max_level=5):
         self.name = name
         self.description = description
@@ -18,8 +21,9 @@ class Skill:
         """スキル効果の値を取得"""
         return self.level
 
-class SkillSystem:
+class SkillSystem(Observable):
     def __init__(self):
+        self.listeners = []  # スキルの変更を知らせる先（HUDなど）
         self.skill_points = 0
         self.skills = {
             "attack_boost": Skill("攻撃力強化", "攻撃力を恒久的に増加させる", 10),
@@ -29,9 +33,22 @@ class SkillSystem:
             "exp_boost": Skill("経験値ブースト", "獲得経験値を増加させる", 5)
         }
         
+    def get_state(self):
+        """スキルポイントと各スキルのレベル"""
+        return {"skill_points": self.skill_points,
+                "levels": {name: skill.level for name, skill in self.skills.items()}}
+    
+    def restore_state(self, state):
+        """get_state()で保存した状態に戻す"""
+        self.skill_points = state["skill_points"]
+        for name, level in state["levels"].items():
+            self.skills[name].level = level
+        self.notify_changed()
+    
     def add_skill_point(self, amount=1):
         """スキルポイントを追加"""
         self.skill_points += amount
+        self.notify_changed()
         
     def upgrade_skill(self, skill_name):
         """スキルをアップグレード"""
@@ -44,6 +61,7 @@ class SkillSystem:
         skill = self.skills[skill_name]
         if skill.level_up():
             self.skill_points -= 1
+            self.notify_changed()
             return True, f"{skill.name}がLv.{skill.level}になった！"
         else:
             return False, f"{skill.name}は最大レベルです"
@@ -0,0 +1,129 @@
+"""空間インデックス（一様グリッド）の定義"""
+import pygame
+from constants import *
+
+
+def merge_rects(rects):
+    """隣接・重なる矩形をまとめ、同じ範囲を覆うより少ない矩形のリストを返す
+    
+    まとめるのは、ほかの矩形に含まれる矩形と、同じ行（yと高さが同じ）か
+    同じ列（xと幅が同じ）で接する・重なる矩形の組だけなので、覆う範囲は変わらない。
+    """
+    merged = [pygame.Rect(rect) for rect in rects]
+    changed = True
+    while changed:
+        changed = False
+        i = 0
+        while i < len(merged):
+            a = merged[i]
+            j = i + 1
+            while j < len(merged):
+                b = merged[j]
+                same_row = a.y == b.y and a.height == b.height and a.left <= b.right and b.left <= a.right
+                same_column = a.x == b.x and a.width == b.width and a.top <= b.bottom and b.top <= a.bottom
+                if a.contains(b):
+                    del merged[j]
+                    changed = True
+                elif b.contains(a) or same_row or same_column:
+                    a = merged[i] = a.union(b)
+                    del merged[j]
+                    changed = True
+                    j = i + 1  # 大きくなった矩形で最初から調べ直す
+                else:
+                    j += 1
+            i += 1
+    return merged
+
+
+class SpatialGrid:
+    """矩形を一定サイズのセルに登録し、指定範囲の近くにある矩形だけを取り出す"""
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (列, 行) -> そのセルに掛かる矩形のリスト
+        self.items = {}  # id(矩形) -> 矩形に対応する物（描画するタイルやキャラクターなど）
+    
+    def cells_for(self, rect):
+        """矩形が触れるセルの座標を列挙"""
+        size = self.cell_size
+        left = rect.left // size
+        right = max(rect.left, rect.right - 1) // size
+        top = rect.top // size
+        bottom = max(rect.top, rect.bottom - 1) // size
+        for row in range(top, bottom + 1):
+            for col in range(left, right + 1):
+                yield (col, row)
+    
+    def insert(self, rect, item=None):
+        """矩形を登録（マップ読み込み時に一度だけ）"""
+        for cell in self.cells_for(rect):
+            self.cells.setdefault(cell, []).append(rect)
+        if item is not None:
+            self.items[id(rect)] = item
+    
+    def query(self, rect):
+        """矩形が触れるセルに登録された矩形を重複なしで返す"""
+        found = []
+        seen = set()
+        for cell in self.cells_for(rect):
+            for candidate in self.cells.get(cell, ()):
+                if id(candidate) not in seen:
+                    seen.add(id(candidate))
+                    found.append(candidate)
+        return found
+    
+    def query_items(self, rect):
+        """矩形と重なる登録矩形に対応する物を返す（画面外の物を描画しないため）"""
+        return [self.items.get(id(candidate), candidate)
+                for candidate in self.query(rect) if rect.colliderect(candidate)]
+    
+    def collides(self, rect):
+        """矩形がいずれかの登録矩形と重なるか"""
+        for cell in self.cells_for(rect):
+            bucket = self.cells.get(cell)
+            if bucket and rect.collidelist(bucket) != -1:
+                return True
+        return False
+
+
+class ColliderRegistry(SpatialGrid):
+    """NPC・敵の当たり判定を保持し、出現・移動・撃破のときだけ更新する"""
+    def __init__(self, cell_size=GRID_CELL_SIZE, padding=CHARACTER_COLLISION_PADDING):
+        super().__init__(cell_size)
+        self.padding = padding  # 少し余裕を持たせた判定箱にする
+        self.rects = {}  # キャラクター -> 当たり判定矩形
+    
+    def add(self, entity):
+        """キャラクターを登録（出現時）"""
+        padding = self.padding
+        rect = pygame.Rect(entity.x - padding, entity.y - padding,
+                           entity.size + padding * 2, entity.size + padding * 2)
+        self.rects[entity] = rect
+        self.insert(rect, entity)
+        entity.colliders = self
+    
+    def remove(self, entity):
+        """キャラクターの登録を解除（撃破時）"""
+        rect = self.rects.pop(entity, None)
+        if rect is None:
+            return
+        del self.items[id(rect)]
+        for cell in self.cells_for(rect):
+            bucket = self.cells[cell]
+            # 同じ座標の別矩形を消さないよう同一性で探す
+            for i, candidate in enumerate(bucket):
+                if candidate is rect:
+                    del bucket[i]
+                    break
+            if not bucket:
+                del self.cells[cell]
+    
+    def update(self, entity):
+        """キャラクターが移動したときに呼ぶ"""
+        rect = self.rects.get(entity)
+        if rect is not None and rect.topleft == (entity.x - self.padding, entity.y - self.padding):
+            return
+        self.remove(entity)
+        self.add(entity)
+    
+    def __contains__(self, entity):
+        return entity in self.rects
@@ -1,9 +1,75 @@
 """スプライトシート処理ユーティリティ"""
 import pygame
+from assets import load_image
+
+# 通常のRPGスプライトシートの配置（方向 -> 行）
+DIRECTION_ROWS = {
+    "down": 0,
+    "left": 1,
+    "right": 2,
+    "up": 3
+}
+
+class SpriteSheet:
+    """スプライトシートのフレームを必要になったときに切り出す
+    
+    フレームはシート画像をコピーしないsubsurfaceで、(行, 列, 拡大率)ごとに
+    初めて要求されたときに切り出し（拡大縮小し）て覚えておく。使わない行は何も作らない。
+    sheet[行] でその行のフレームのリストを返す（フレームのリストのリストと同じように使える）
+    """
+    __slots__ = ("sheet", "frame_width", "frame_height", "scale", "rows", "cols", "frames")
+    
+    def __init__(self, sheet, frame_width, frame_height, scale=1.0):
+        self.sheet = sheet
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.scale = scale  # 拡大率を指定しないときの拡大率
+        self.rows = sheet.get_height() // frame_height
+        self.cols = sheet.get_width() // frame_width
+        self.frames = {}  # (行, 列, 拡大率) -> フレーム
+    
+    def get_frame_rect(self, direction, frame):
+        """フレームのシート上の矩形（directionは "down" などの方向か行番号）"""
+        row = DIRECTION_ROWS.get(direction, 0) if isinstance(direction, str) else direction
+        return pygame.Rect(
+            frame * self.frame_width,
+            row * self.frame_height,
+            self.frame_width,
+            self.frame_height
+        )
+    
+    def get_frame(self, direction, frame, scale=None):
+        """フレームを返す（directionは "down" などの方向か行番号）"""
+        frame_rect = self.get_frame_rect(direction, frame)
+        scale = self.scale if scale is None else scale
+        key = (frame_rect.y // self.frame_height, frame, scale)
+        surface = self.frames.get(key)
+        if surface is None:
+            surface = self.sheet.subsurface(frame_rect)
+            
+            # スケーリング
+            if scale != 1.0:
+                new_width = int(self.frame_width * scale)
+                new_height = int(self.frame_height * scale)
+                surface = pygame.transform.scale(surface, (new_width, new_height))
+            self.frames[key] = surface
+        return surface
+    
+    def get_frames(self, direction, scale=None):
+        """1行（1方向）分のフレームのリスト"""
+        return [self.get_frame(direction, col, scale) for col in range(self.cols)]
+    
+    def __len__(self):
+        return self.rows
+    
+    def __getitem__(self, row):
+        if not 0 <= row < self.rows:
+            raise IndexError(row)
+        return self.get_frames(row)
 
 def load_sprite_sheet(filepath, frame_width, frame_height, scale=1.0):
     """
-    スプライトシートを読み込んで個別のフレームに分割
+    スプライトシートを読み込む（フレームは使うときに切り出す）
     
     Args:
         filepath: スプライトシートのパス
@@ -12,38 +78,11 @@ def load_sprite_sheet(filepath, frame_width, frame_height, scale=1.0):
         scale: 拡大率（デフォルト1.0）
     
     Returns:
-        フレームのリスト [[row0_frames], [row1_frames], ...]
+        SpriteSheet（sheet[行][列] でフレームを取り出せる）
     """
     try:
-        sheet = pygame.image.load(filepath)
-        sheet_width, sheet_height = sheet.get_size()
-        
-        frames = []
-        rows = sheet_height // frame_height
-        cols = sheet_width // frame_width
-        
-        for row in range(rows):
-            row_frames = []
-            for col in range(cols):
-                # 各フレームを切り出す
-                frame_rect = pygame.Rect(
-                    col * frame_width,
-                    row * frame_height,
-                    frame_width,
-                    frame_height
-                )
-                frame = sheet.subsurface(frame_rect).copy()
-                
-                # スケーリング
-                if scale != 1.0:
-                    new_width = int(frame_width * scale)
-                    new_height = int(frame_height * scale)
-                    frame = pygame.transform.scale(frame, (new_width, new_height))
-                
-                row_frames.append(frame)
-            frames.append(row_frames)
-        
-        return frames
+        sheet = load_image(filepath)
+        return SpriteSheet(sheet, frame_width, frame_height, scale)
     except Exception as e:
         print(f"スプライトシート読み込みエラー: {filepath}")
         print(f"エラー詳細: {e}")
@@ -62,14 +101,7 @@ def get_animation_frames(sprite_sheet, direction="down"):
     if not sprite_sheet:
         return []
     
-    direction_map = {
-        "down": 0,
-        "left": 1,
-        "right": 2,
-        "up": 3
-    }
-    
-    row = direction_map.get(direction, 0)
+    row = DIRECTION_ROWS.get(direction, 0)
     if row < len(sprite_sheet):
         return sprite_sheet[row]
     return []
\ No newline at end of file
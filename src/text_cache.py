@@ -0,0 +1,47 @@
+"""描画済み文字列のキャッシュ"""
+from collections import OrderedDict
+from constants import *
+
+class TextCache:
+    """font.renderの結果を(フォント, 文字列, 色, アンチエイリアス)ごとに保持する（LRU・メモリ上限付き）"""
+    def __init__(self, max_bytes=TEXT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()  # キー -> 描画済みサーフェス（末尾ほど最近使った）
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font, text, color, antialias=True):
+        """文字列を描画したサーフェスを返す（返したサーフェスは共有なので書き換えないこと）"""
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        
+        # 日本語のラスタライズは重いので、初めての組み合わせのときだけ行う
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        self.bytes_used += self.get_surface_bytes(surface)
+        
+        # 上限を超えたら古いものから捨てる
+        while self.bytes_used > self.max_bytes and len(self.surfaces) > 1:
+            _, old_surface = self.surfaces.popitem(last=False)
+            self.bytes_used -= self.get_surface_bytes(old_surface)
+        return surface
+    
+    def get_surface_bytes(self, surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+    
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes_used = 0
+
+# ゲーム全体で共有するキャッシュ
+text_cache = TextCache()
+
+def render_text(font, text, color, antialias=True):
+    """共有キャッシュを使ってfont.renderする"""
+    return text_cache.render(font, text, color, antialias)
@@ -0,0 +1,182 @@
+"""タイルマップ（NumPy配列によるマップデータ）の定義"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import numpy as np
+import pygame
+from constants import *
+from enemy_types import ENEMY_TYPES
+
+# タイルの種類（配列の値がこのリストの添字＝タイルID）
+# (記号, 種類, 色, 通れないか)
+TILE_TYPES = [
+    ('.', 'grass', LIGHT_GREEN, False),
+    ('=', 'road', BROWN, False),
+    (':', 'plaza', GRAY, False),
+    (',', 'forest', DARK_GREEN, False),
+    ('T', 'tree', DARK_GREEN, True),
+    ('~', 'water', BLUE, True),
+    ('#', 'rock', GRAY, True),
+]
+
+# 敵の出現位置の記号 -> 敵の種類（data/enemies.jsonのsymbol。その場所のタイルは草地になる）
+SPAWN_MARKERS = {enemy_type.symbol: enemy_type.key for enemy_type in ENEMY_TYPES if enemy_type.symbol}
+
+# 記号 -> タイルID、タイルID -> 色・通行不可の早見表
+TILE_IDS = {symbol: tile_id for tile_id, (symbol, _, _, _) in enumerate(TILE_TYPES)}
+TILE_COLORS = [color for _, _, color, _ in TILE_TYPES]
+BLOCKED_TILES = np.array([blocked for _, _, _, blocked in TILE_TYPES], dtype=bool)
+
+# コンパイル済みマップ（map_compiler.pyが出力）の形式
+# ヘッダー: 識別子, バージョン, タイルサイズ, 列数, 行数, 定義のハッシュ, 各セクションの(位置, 長さ)
+BUNDLE_MAGIC = b"RPGM"
+BUNDLE_VERSION = 3
+BUNDLE_EXTENSION = ".rpgmap"
+BUNDLE_SECTIONS = ("tiles", "blocked", "meta", "background")
+BUNDLE_HEADER = struct.Struct("<4sHHII8s" + "QQ" * len(BUNDLE_SECTIONS))
+# コンパイル時に焼き込むタイルの定義（constants.pyの色）と敵の出現記号（data/enemies.json）のハッシュ
+# どちらかを変えると、マップファイルより新しいコンパイル済みファイルでも使わない
+BUNDLE_DEFINITIONS_HASH = hashlib.sha1(
+    repr((TILE_TYPES, sorted(SPAWN_MARKERS.items()))).encode("utf-8")).digest()[:8]
+
+
+def bundle_path_for(path):
+    """マップファイルに対応するコンパイル済みファイルのパス"""
+    return os.path.splitext(path)[0] + BUNDLE_EXTENSION
+
+
+class TileMap:
+    """TILE_SIZE単位のタイルIDの2次元配列と通行不可マスクを持つマップデータ"""
+    def __init__(self, tiles, name="", spawns=None, blocked=None, background=None):
+        self.tiles = tiles  # (行, 列) のタイルID配列
+        # 通れないタイルはTrue
+        self.blocked = BLOCKED_TILES[tiles] if blocked is None else blocked
+        self.background = background  # コンパイル時に描画済みの背景（なければNone）
+        self.name = name
+        self.spawns = spawns or []  # [(敵の種類, x, y), ...]
+        self.rows, self.cols = tiles.shape
+        self.width = self.cols * TILE_SIZE
+        self.height = self.rows * TILE_SIZE
+    
+    @classmethod
+    def open(cls, path):
+        """マップを開く（新しいコンパイル済みファイルがあればそちらを使う）"""
+        bundle_path = bundle_path_for(path)
+        if (os.path.exists(bundle_path)
+                and os.path.getmtime(bundle_path) >= os.path.getmtime(path)):
+            try:
+                return cls.load_bundle(bundle_path)
+            except (ValueError, struct.error) as e:
+                # 古い形式や定義が変わる前のファイルは使わず、テキストから読み込む
+                print(f"コンパイル済みマップを使えません（作り直してください）: {e}")
+        return cls.load(path)
+    
+    @classmethod
+    def load_bundle(cls, path):
+        """コンパイル済みマップをmmapで開く（配列と背景はファイルを直接参照し、コピーしない）"""
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        header = BUNDLE_HEADER.unpack_from(data, 0)
+        magic, version, tile_size, cols, rows, definitions_hash = header[:6]
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION or tile_size != TILE_SIZE:
+            raise ValueError(f"{path}: 対応していないマップ形式です")
+        if definitions_hash != BUNDLE_DEFINITIONS_HASH:
+            raise ValueError(f"{path}: タイルか敵の定義がコンパイル後に変わっています")
+        sections = {name: (header[6 + i * 2], header[7 + i * 2])
+                    for i, name in enumerate(BUNDLE_SECTIONS)}
+        
+        def grid(name, dtype):
+            offset, length = sections[name]
+            return np.frombuffer(data, dtype=dtype, count=rows * cols, offset=offset).reshape(rows, cols)
+        
+        offset, length = sections["meta"]
+        meta = json.loads(bytes(data[offset:offset + length]).decode("utf-8"))
+        offset, length = sections["background"]
+        background = pygame.image.frombuffer(memoryview(data)[offset:offset + length],
+                                             (cols * TILE_SIZE, rows * TILE_SIZE), "RGB")
+        
+        tilemap = cls(grid("tiles", np.uint8), meta["name"],
+                      [tuple(spawn) for spawn in meta["spawns"]],
+                      blocked=grid("blocked", bool), background=background)
+        tilemap.bundle = data  # 配列と背景が参照している間はmmapを閉じない
+        return tilemap
+    
+    @classmethod
+    def load(cls, path):
+        """maps/フォルダのテキスト形式のマップを読み込む
+        
+        形式:
+            # コメント
+            name: マップ名
+            ---
+            1文字1タイルの行（記号は TILE_TYPES / SPAWN_MARKERS）
+        """
+        name = ""
+        lines = []
+        with open(path, encoding="utf-8") as f:
+            in_header = True
+            for line in f:
+                line = line.rstrip("\n")
+                if in_header:
+                    if line.startswith("#") or not line.strip():
+                        continue
+                    if line.strip() == "---":
+                        in_header = False
+                    elif line.startswith("name:"):
+                        name = line[len("name:"):].strip()
+                    continue
+                if line:
+                    lines.append(line)
+        
+        cols = max(len(line) for line in lines)
+        tiles = np.zeros((len(lines), cols), dtype=np.uint8)
+        spawns = []
+        for row, line in enumerate(lines):
+            for col, symbol in enumerate(line):
+                if symbol in SPAWN_MARKERS:
+                    spawns.append((SPAWN_MARKERS[symbol], col * TILE_SIZE, row * TILE_SIZE))
+                    symbol = '.'
+                if symbol not in TILE_IDS:
+                    raise ValueError(f"{path}:{row + 1}: 不明なタイル記号 '{symbol}'")
+                tiles[row, col] = TILE_IDS[symbol]
+        return cls(tiles, name, spawns)
+    
+    def tile_range(self, rect):
+        """矩形が掛かるタイルの範囲（マップ外は切り詰める）"""
+        left = max(0, rect.left // TILE_SIZE)
+        right = min(self.cols, (rect.right - 1) // TILE_SIZE + 1)
+        top = max(0, rect.top // TILE_SIZE)
+        bottom = min(self.rows, (rect.bottom - 1) // TILE_SIZE + 1)
+        return left, right, top, bottom
+    
+    def collides(self, rect):
+        """矩形が通れないタイルに重なるか（配列の切り出しだけで判定）"""
+        left, right, top, bottom = self.tile_range(rect)
+        if left >= right or top >= bottom:
+            return False
+        return bool(self.blocked[top:bottom, left:right].any())
+    
+    def draw_region(self, surface, col_start, col_end, row_start, row_end, offset=(0, 0)):
+        """指定範囲のタイルを描画（offsetはワールド座標から描画先座標への補正）"""
+        offset_x, offset_y = offset
+        for row in range(row_start, row_end):
+            y = row * TILE_SIZE + offset_y
+            tile_row = self.tiles[row]
+            for col in range(col_start, col_end):
+                tile_id = tile_row[col]
+                x = col * TILE_SIZE + offset_x
+                surface.fill(TILE_COLORS[tile_id], (x, y, TILE_SIZE, TILE_SIZE))
+                if tile_id == TILE_IDS['T']:
+                    # 木は幹と葉を描く
+                    pygame.draw.rect(surface, BROWN, (x + 16, y + 22, 8, 18))
+                    pygame.draw.circle(surface, GREEN, (x + TILE_SIZE // 2, y + 16), 15)
+    
+    def draw(self, surface):
+        """マップ全体を描画（描画済みの背景があれば転送するだけ）"""
+        if self.background:
+            surface.blit(self.background, (0, 0))
+        else:
+            self.draw_region(surface, 0, self.cols, 0, self.rows)
@@ -1,8 +1,11 @@
 """UI要素の定義"""
 import pygame
 from constants import *
+from text_cache import render_text
 
 class DialogueBox:
+    __slots__ = ("active", "text", "speaker", "portrait", "current_line", "lines")
+    
     def __init__(self):
         self.active = False
         self.text = ""
@@ -29,6 +32,20 @@ class DialogueBox:
         self.active = False
         self.portrait = None
         
+    def get_state(self):
+        """表示中の会話（ポートレートは含まない）"""
+        return {"active": self.active, "text": self.text, "speaker": self.speaker,
+                "current_line": self.current_line, "lines": list(self.lines)}
+    
+    def restore_state(self, state, portrait=None):
+        """get_state()で保存した状態に戻す"""
+        self.active = state["active"]
+        self.text = state["text"]
+        self.speaker = state["speaker"]
+        self.current_line = state["current_line"]
+        self.lines = list(state["lines"])
+        self.portrait = portrait
+    
     def next_line(self):
         """次の行に進む"""
         if self.lines and self.current_line < len(self.lines) - 1:
@@ -44,7 +61,7 @@ class DialogueBox:
         # Draw dialogue box
         box_height = 160
         box_y = SCREEN_HEIGHT - box_height - 20
-        pygame.draw.rect(screen, BLACK, (20, box_y, SCREEN_WIDTH - 40, box_height))
+        box_rect = pygame.draw.rect(screen, BLACK, (20, box_y, SCREEN_WIDTH - 40, box_height))
         pygame.draw.rect(screen, WHITE, (20, box_y, SCREEN_WIDTH - 40, box_height), 2)
         
         # Draw portrait if available
@@ -59,16 +76,17 @@ class DialogueBox:
             text_x_offset = 200  # テキストを右にずらす
         
         # Draw speaker name
-        speaker_text = font.render(self.speaker + ":", True, YELLOW)
+        speaker_text = render_text(font, self.speaker + ":", YELLOW)
         screen.blit(speaker_text, (text_x_offset, box_y + 10))
         
         # Draw dialogue text
-        dialogue_text = font.render(self.text, True, WHITE)
+        dialogue_text = render_text(font, self.text, WHITE)
         screen.blit(dialogue_text, (text_x_offset, box_y + 40))
         
         # Draw instruction
         if self.lines and self.current_line < len(self.lines) - 1:
-            instruction_text = font.render(f"スペースキーで次へ ({self.current_line + 1}/{len(self.lines)})", True, WHITE)
+            instruction_text = render_text(font, f"スペースキーで次へ ({self.current_line + 1}/{len(self.lines)})", WHITE)
         else:
-            instruction_text = font.render("スペースキーで閉じる", True, WHITE)
-        screen.blit(instruction_text, (text_x_offset, box_y + 120))
\ No newline at end of file
+            instruction_text = render_text(font, "スペースキーで閉じる", WHITE)
+        screen.blit(instruction_text, (text_x_offset, box_y + 120))
+        return box_rect
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""チャンク単位で読み込むワールド（画面より大きいマップ）の定義"""
+import pygame
+from constants import *
+
+
+class ChunkedWorld:
+    """タイルマップを一定サイズのチャンクに分け、カメラ周辺のチャンクだけを描画用に保持する"""
+    def __init__(self, tilemap, chunk_tiles=CHUNK_TILES):
+        self.tilemap = tilemap
+        self.chunk_tiles = chunk_tiles
+        self.chunk_size = chunk_tiles * TILE_SIZE  # チャンク1つのピクセルサイズ
+        self.chunks = {}  # (チャンク列, チャンク行) -> 描画済みサーフェス
+        self.loaded_range = None  # 前回読み込んだチャンクの範囲
+    
+    def chunk_range(self, rect, margin=0):
+        """矩形に掛かるチャンクの範囲（marginチャンク分広げ、ワールド外は切り詰める）"""
+        size = self.chunk_size
+        max_col = (self.tilemap.width - 1) // size
+        max_row = (self.tilemap.height - 1) // size
+        left = max(0, rect.left // size - margin)
+        right = min(max_col, (rect.right - 1) // size + margin)
+        top = max(0, rect.top // size - margin)
+        bottom = min(max_row, (rect.bottom - 1) // size + margin)
+        return left, right, top, bottom
+    
+    def update(self, camera):
+        """カメラ周辺のチャンクを読み込み、離れたチャンクを破棄する"""
+        view = camera.get_view_rect()
+        load_range = self.chunk_range(view, CHUNK_LOAD_MARGIN)
+        if load_range == self.loaded_range:
+            return  # チャンク境界をまたいでいなければ何もしない
+        self.loaded_range = load_range
+        
+        left, right, top, bottom = load_range
+        for row in range(top, bottom + 1):
+            for col in range(left, right + 1):
+                if (col, row) not in self.chunks:
+                    self.chunks[(col, row)] = self.load_chunk(col, row)
+        
+        # 少し余裕を持たせて破棄（境界付近での読み込み直しを防ぐ）
+        left, right, top, bottom = self.chunk_range(view, CHUNK_LOAD_MARGIN + 1)
+        for key in list(self.chunks):
+            col, row = key
+            if not (left <= col <= right and top <= row <= bottom):
+                del self.chunks[key]
+    
+    def load_chunk(self, col, row):
+        """チャンク1つ分の地形を描画する"""
+        tilemap = self.tilemap
+        x = col * self.chunk_size
+        y = row * self.chunk_size
+        width = min(self.chunk_size, tilemap.width - x)
+        height = min(self.chunk_size, tilemap.height - y)
+        chunk = pygame.Surface((width, height))
+        if tilemap.background:
+            # コンパイル済みの背景から切り出す（mmapのうちこの範囲のページだけが読まれる）
+            chunk.blit(tilemap.background, (0, 0), (x, y, width, height))
+        else:
+            col_start = col * self.chunk_tiles
+            row_start = row * self.chunk_tiles
+            tilemap.draw_region(chunk, col_start, min(tilemap.cols, col_start + self.chunk_tiles),
+                                row_start, min(tilemap.rows, row_start + self.chunk_tiles),
+                                (-x, -y))
+        if pygame.display.get_surface():
+            chunk = chunk.convert()
+        return chunk
+    
+    def draw_area(self, surface, area, dest=(0, 0)):
+        """ワールド上の範囲areaを描画先のdestの位置に描く"""
+        left, right, top, bottom = self.chunk_range(area)
+        for row in range(top, bottom + 1):
+            for col in range(left, right + 1):
+                chunk = self.chunks.get((col, row))
+                if chunk is None:
+                    chunk = self.chunks[(col, row)] = self.load_chunk(col, row)
+                chunk_x = col * self.chunk_size
+                chunk_y = row * self.chunk_size
+                # チャンクのうちareaに含まれる部分だけを転送
+                part = area.clip(pygame.Rect(chunk_x, chunk_y, chunk.get_width(), chunk.get_height()))
+                surface.blit(chunk, (dest[0] + part.x - area.x, dest[1] + part.y - area.y),
+                             part.move(-chunk_x, -chunk_y))
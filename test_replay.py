@@ -0,0 +1,46 @@
+"""リプレイのテスト（バトルの後にマップを移ってもキーフレームを保存・再生できるか）"""
+import sys
+import tempfile
+sys.path.append('src')
+
+from headless import KeyState, init_headless
+init_headless()
+import pygame
+from game import Game
+from replay import ReplayRecorder, ReplayPlayer, Replay
+
+# 通常モード（ストーリーモードでないとバトルになる）で森から始める
+game = Game(headless=True, seed=1)
+game.game_state.story_mode = False
+game.change_map(1)
+# 森の入り口のスライムの隣に立ってから記録を始める
+enemy = game.current_map.enemies[0]
+game.player.x, game.player.y = enemy.x + 5, enemy.y + 5
+recorder = ReplayRecorder(game, keyframe_interval=30)
+
+# バトルを始め、勝つまで攻撃する
+for _ in range(3000):
+    recorder.update(KeyState(), [pygame.K_SPACE])
+    if enemy.hp <= 0 and not game.battle:
+        break
+print(f"敵のHP: {enemy.hp}  バトル: {game.battle}")
+assert enemy.hp <= 0 and game.battle is None, "勝ったバトルが終わっていない"
+
+# 勝ったら南へ歩いて村へ移り、移った後もキーフレームを何回か保存する
+for _ in range(600):
+    recorder.update(KeyState([pygame.K_DOWN]), [])
+    if game.current_map_id == 0:
+        break
+for _ in range(120):
+    recorder.update(KeyState(), [])
+print(f"移った先のマップ: {game.current_map_id}")
+assert game.current_map_id == 0, "森から村へ移っていない"
+
+# 保存したリプレイを再生して、すべてのキーフレームと一致するか
+with tempfile.TemporaryDirectory() as directory:
+    path = recorder.save(directory)
+    player = ReplayPlayer(Replay.load(path))
+    ok = player.run()
+print(f"キーフレーム: {len(player.replay.keyframes)}個  一致: {ok}  食い違い: {player.desyncs}")
+assert ok, "リプレイがキーフレームと食い違った"
+print("OK")